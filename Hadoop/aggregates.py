@@ -0,0 +1,100 @@
+"""Text statistics computed together in one scan of the input.
+
+Every selected aggregate is fed from the same tokenization of each block,
+so the input is read and split once however many statistics are wanted:
+
+    words    occurrences of each word
+    ngrams   occurrences of each sequence of N consecutive words of a line
+    lines    totals of lines, tokens and characters
+    lengths  histogram of token lengths, in characters
+    files    tokens per input file
+
+All aggregates are sums, so partial results of shards or mappers are merged
+by adding them up. Records are written as `aggregate<TAB>item<TAB>count`.
+"""
+
+from collections import Counter
+
+AGGREGATES = ('words', 'ngrams', 'lines', 'lengths', 'files')
+
+def parse_aggregates(text):
+    """Parse a comma-separated aggregate selection, keeping AGGREGATES order."""
+    selected = set(text.split(','))
+    unknown = selected.difference(AGGREGATES)
+    if unknown:
+        raise ValueError(f"unknown aggregates: {', '.join(sorted(unknown))}")
+    return [name for name in AGGREGATES if name in selected]
+
+class TextStats:
+    """Counters of the selected aggregates, updated block by block."""
+
+    def __init__(self, aggregates, n=2):
+        self.aggregates = list(aggregates)
+        self.n = n
+        self.counters = {name: Counter() for name in self.aggregates}
+
+    def update(self, text, source=''):
+        """Add a block of whole lines read from `source`."""
+        counters = self.counters
+        grams = counters.get('ngrams')
+        if grams is None:
+            tokens = text.split()
+        else:
+            # n-grams do not cross lines, so tokenize line by line and reuse
+            # the tokens for the other aggregates
+            n = self.n
+            tokens = []
+            for line in text.splitlines():
+                line_tokens = line.split()
+                if len(line_tokens) >= n:
+                    grams.update(zip(*[line_tokens[i:] for i in range(n)]))
+                tokens += line_tokens
+
+        if 'words' in counters or 'lengths' in counters:
+            words = Counter(tokens)
+            if 'words' in counters:
+                counters['words'].update(words)
+            if 'lengths' in counters:
+                lengths = counters['lengths']
+                for word, count in words.items():
+                    lengths[len(word)] += count
+        if 'lines' in counters:
+            lines = counters['lines']
+            lines['lines'] += text.count('\n') + (0 if not text or text.endswith('\n') else 1)
+            lines['tokens'] += len(tokens)
+            lines['characters'] += len(text)
+        if 'files' in counters:
+            counters['files'][source] += len(tokens)
+
+    def merge(self, other):
+        for name, counter in other.counters.items():
+            self.counters[name].update(counter)
+        return self
+
+    def entries(self):
+        return sum(map(len, self.counters.values()))
+
+    def clear(self):
+        for counter in self.counters.values():
+            counter.clear()
+
+    def records(self, top=None):
+        """(aggregate, item, count) rows, the top `top` words and n-grams only.
+
+        Words and n-grams come in descending count order, lengths by length,
+        line totals and files in a fixed order.
+        """
+        for name in self.aggregates:
+            counter = self.counters[name]
+            if name in ('words', 'ngrams'):
+                items = counter.most_common(top)
+            elif name == 'lengths':
+                items = sorted(counter.items())
+            elif name == 'lines':
+                items = [(key, counter[key]) for key in ('lines', 'tokens', 'characters')]
+            else:
+                items = sorted(counter.items())
+            for item, count in items:
+                if name == 'ngrams':
+                    item = ' '.join(item)
+                yield name, item, count
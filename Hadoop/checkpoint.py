@@ -0,0 +1,80 @@
+"""Word count checkpoints for incremental counting of append-only files.
+
+A checkpoint is a gzip-compressed text file: one JSON header line with the
+byte offset counted so far and a fingerprint of the input up to that offset,
+followed by one word<TAB>count line per word in the counter's order.
+"""
+
+from collections import Counter, namedtuple
+import gzip
+import hashlib
+import json
+import os
+
+VERSION = 1
+# Bytes hashed at each end of the counted prefix
+FINGERPRINT_BYTES = 64 * 1024
+SCAN_BLOCK = 64 * 1024
+
+State = namedtuple('State', ['counter', 'offset', 'fingerprint'])
+
+def fingerprint(filename, offset):
+    """Hash the head and the tail of the first `offset` bytes of the file.
+
+    Appending to the file leaves this unchanged, while rewriting it changes
+    the head or the bytes just before the offset in all but contrived cases.
+    """
+    digest = hashlib.sha256(str(offset).encode())
+    with open(filename, 'rb') as f:
+        digest.update(f.read(min(FINGERPRINT_BYTES, offset)))
+        tail_start = max(0, offset - FINGERPRINT_BYTES)
+        f.seek(tail_start)
+        digest.update(f.read(offset - tail_start))
+    return digest.hexdigest()
+
+def matches(filename, state):
+    """Whether the file still starts with the content the checkpoint counted."""
+    return (os.path.getsize(filename) >= state.offset
+            and fingerprint(filename, state.offset) == state.fingerprint)
+
+def load(path):
+    """Read a checkpoint, or return None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('version') != VERSION:
+            return None
+        counter = Counter()
+        for line in f:
+            word, count = line.rstrip('\n').split('\t')
+            counter[word] = int(count)
+    return State(counter, header['offset'], header['fingerprint'])
+
+def save(path, counter, filename, offset):
+    """Atomically write the counts of the first `offset` bytes of the file."""
+    header = {
+        'version': VERSION,
+        'input': os.path.abspath(filename),
+        'offset': offset,
+        'fingerprint': fingerprint(filename, offset),
+    }
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=1) as f:
+        f.write(json.dumps(header) + '\n')
+        # Words come from str.split(), so they never contain tabs or newlines
+        f.writelines(f'{word}\t{count}\n' for word, count in counter.items())
+    os.replace(tmp_path, path)
+
+def last_line_end(filename, start, end):
+    """Offset just past the last newline in [start, end), or start if none."""
+    with open(filename, 'rb') as f:
+        pos = end
+        while pos > start:
+            lo = max(start, pos - SCAN_BLOCK)
+            f.seek(lo)
+            index = f.read(pos - lo).rfind(b'\n')
+            if index >= 0:
+                return lo + index + 1
+            pos = lo
+    return start
@@ -0,0 +1,213 @@
+"""Transparent gzip and bzip2 input for the word count engines.
+
+Both formats allow several independently compressed members (gzip members,
+bzip2 streams) to be concatenated, as bgzip, pbzip2 and `cat a.gz b.gz`
+produce. Such files are split by byte range: each range decodes the members
+that start inside it, so ranges can be decompressed in parallel. Files with
+one large member can only be decoded in order; prefetch() then moves the
+decompression to a background thread (zlib and bz2 release the GIL), so it
+overlaps with the counting.
+"""
+
+import bz2
+import io
+import queue
+import re
+import threading
+import zlib
+
+GZIP = 'gzip'
+BZIP2 = 'bzip2'
+
+READ_BLOCK = 1024 * 1024
+# Output a candidate member must decode to without error to be accepted
+VALIDATE_BYTES = 64 * 1024
+# A file is split only if its first member ends within this many bytes
+PROBE_BYTES = 16 * 1024 * 1024
+HEADER_BYTES = 10
+
+# Member headers: gzip magic with deflate and no reserved flag bits set, and
+# bzip2 magic with a block size followed by the first block's magic, or by
+# the end-of-stream magic of an empty stream
+MEMBER_PATTERNS = {
+    GZIP: re.compile(rb'\x1f\x8b\x08[\x00-\x1f]'),
+    BZIP2: re.compile(rb'BZh[1-9](?:1AY&SY|\x17rE8P\x90)'),
+}
+
+def detect_format(head):
+    """Compression format of data starting with `head`, or None for plain text."""
+    for fmt, pattern in MEMBER_PATTERNS.items():
+        if pattern.match(head):
+            return fmt
+    return None
+
+def detect_file_format(path):
+    with open(path, 'rb') as f:
+        return detect_format(f.read(HEADER_BYTES))
+
+def _decompressor(fmt):
+    if fmt == GZIP:
+        return zlib.decompressobj(wbits=31)
+    return bz2.BZ2Decompressor()
+
+def decode_members(f, fmt, pos=0, end=None):
+    """Decompress consecutive members from f, whose read position is pos.
+
+    Yields decompressed chunks. Stops at the end of the input, at the first
+    member starting at or after `end`, or at trailing zero bytes (gzip
+    padding). Any other bytes that do not start a member raise OSError.
+    """
+    data = b''
+    while end is None or pos < end:
+        while len(data) < HEADER_BYTES:
+            more = f.read(READ_BLOCK)
+            if not more:
+                break
+            data += more
+        if not MEMBER_PATTERNS[fmt].match(data):
+            _check_padding(f, fmt, pos, data)
+            return
+        decompressor = _decompressor(fmt)
+        while True:
+            out = decompressor.decompress(data)
+            if out:
+                yield out
+            if decompressor.eof:
+                pos += len(data) - len(decompressor.unused_data)
+                data = decompressor.unused_data
+                break
+            pos += len(data)
+            data = f.read(READ_BLOCK)
+            if not data:
+                raise EOFError(f'Truncated {fmt} input')
+
+def _check_padding(f, fmt, pos, data):
+    """Raise OSError unless data and the rest of f are all zero bytes."""
+    while data:
+        if data.strip(b'\0'):
+            raise OSError(f'Invalid {fmt} data at byte {pos}')
+        pos += len(data)
+        data = f.read(READ_BLOCK)
+
+def _is_member(f, fmt, pos):
+    """Whether a member decodes cleanly from pos, up to VALIDATE_BYTES of output."""
+    f.seek(pos)
+    decoded = 0
+    try:
+        for out in decode_members(f, fmt, pos, pos + 1):
+            decoded += len(out)
+            if decoded >= VALIDATE_BYTES:
+                break
+    except (EOFError, OSError, zlib.error):
+        return False
+    return True
+
+def _find_member(f, fmt, start, end):
+    """Offset of the first valid member header in [start, end), or None."""
+    pattern = MEMBER_PATTERNS[fmt]
+    overlap = HEADER_BYTES
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        window = f.read(min(READ_BLOCK, end - pos) + overlap)
+        if not window:
+            return None
+        for match in pattern.finditer(window):
+            candidate = pos + match.start()
+            if candidate >= end:
+                return None
+            if _is_member(f, fmt, candidate):
+                return candidate
+        pos += READ_BLOCK
+    return None
+
+def iter_members(path, fmt, start=0, end=None):
+    """Decompressed chunks of the members of the file that start in [start, end)."""
+    with open(path, 'rb') as f:
+        if start > 0:
+            start = _find_member(f, fmt, start, end)
+            if start is None:
+                return
+        f.seek(start)
+        yield from decode_members(f, fmt, start, end)
+
+def is_splittable(path, fmt):
+    """Whether the file's first member ends early and another one follows."""
+    with open(path, 'rb') as f:
+        decompressor = _decompressor(fmt)
+        read = 0
+        while read < PROBE_BYTES:
+            data = f.read(READ_BLOCK)
+            if not data:
+                return False
+            read += len(data)
+            try:
+                decompressor.decompress(data)
+            except (EOFError, OSError, zlib.error):
+                return False
+            if decompressor.eof:
+                rest = decompressor.unused_data + f.read(HEADER_BYTES)
+                return MEMBER_PATTERNS[fmt].match(rest) is not None
+    return False
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+_DONE = object()
+
+def prefetch(chunks, depth=8):
+    """Iterate over `chunks` while a background thread produces them ahead."""
+    buffer = queue.Queue(depth)
+
+    def produce():
+        try:
+            for chunk in chunks:
+                buffer.put(chunk)
+        except BaseException as error:
+            buffer.put(_Failure(error))
+        else:
+            buffer.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _Failure):
+            raise item.error
+        yield item
+
+class ChunkReader(io.RawIOBase):
+    """A readable binary file over an iterator of byte chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._chunk = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._chunk:
+            try:
+                self._chunk = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._chunk))
+        b[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+def open_text(stream):
+    """Return a text stream, decompressing it in a background thread if needed.
+
+    Plain text streams are returned unchanged; the format is detected from
+    the first bytes of the underlying binary buffer.
+    """
+    binary = stream.buffer
+    fmt = detect_format(binary.peek(HEADER_BYTES)[:HEADER_BYTES])
+    if fmt is None:
+        return stream
+    reader = io.BufferedReader(ChunkReader(prefetch(decode_members(binary, fmt))))
+    return io.TextIOWrapper(reader, encoding=stream.encoding, errors=stream.errors)
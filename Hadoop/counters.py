@@ -0,0 +1,85 @@
+"""Hadoop streaming counters, status and timing reports on stderr.
+
+Hadoop streaming turns stderr lines of the form
+
+    reporter:counter:<group>,<counter>,<amount>
+    reporter:status:<message>
+
+into job counters and task status. Counts are buffered and written at most
+once per interval, so a task reports a handful of lines, not one per record.
+Callers handle records in batches of Reporter.batch and count each batch
+with one incr() call per counter, so counting costs little per record.
+"""
+
+import sys
+import time
+
+class Reporter:
+    """Buffers counter increments and reports them every `interval` seconds.
+
+    The status line shows the throughput of `rate_counter`. With timing on,
+    phase() attributes the time since the previous phase() call to the phase
+    that was current, and close() reports the totals in milliseconds.
+    """
+
+    # Records handled between two incr() calls of a counter
+    batch = 1000
+
+    def __init__(self, group, rate_counter, interval=10.0, timing=False, stream=sys.stderr):
+        self.group = group
+        self.rate_counter = rate_counter
+        self.interval = interval
+        self.stream = stream
+        self.totals = {}
+        self._pending = {}
+        self._start = self._last_flush = time.monotonic()
+        self.timings = {} if timing else None
+        self._phase = None
+        self._phase_start = time.perf_counter()
+        if not timing:
+            self.phase = _ignore
+
+    def incr(self, counter, amount=1):
+        self._pending[counter] = self._pending.get(counter, 0) + amount
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def phase(self, name):
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.timings[self._phase] = self.timings.get(self._phase, 0.0) + now - self._phase_start
+        self._phase = name
+        self._phase_start = now
+
+    def status(self, message):
+        print(f'reporter:status:{message}', file=self.stream)
+
+    def flush(self):
+        for counter, amount in self._pending.items():
+            if amount:
+                print(f'reporter:counter:{self.group},{counter},{amount}', file=self.stream)
+                self.totals[counter] = self.totals.get(counter, 0) + amount
+        self._pending = {}
+        self._last_flush = now = time.monotonic()
+        processed = self.totals.get(self.rate_counter, 0)
+        rate = processed / max(now - self._start, 1e-9)
+        self.status(f'{self.group}: {processed} {self.rate_counter.lower()}, {rate:.0f}/s')
+
+    def close(self):
+        self.flush()
+        if self.timings is not None:
+            self.phase(None)
+            for name, seconds in self.timings.items():
+                print(f'reporter:counter:{self.group} timing,{name} (ms),{seconds * 1000:.0f}',
+                      file=self.stream)
+            self.status(f'{self.group} time: ' + ', '.join(
+                f'{name} {seconds:.3f}s' for name, seconds in self.timings.items()))
+
+def _ignore(name):
+    pass
+
+def line_bytes(line):
+    """UTF-8 size of a decoded line, without encoding plain ASCII lines."""
+    if line.isascii():
+        return len(line)
+    return len(line.encode('utf-8', errors='surrogateescape'))
@@ -0,0 +1,151 @@
+"""Count-Min sketch counting backend, mergeable by element-wise addition."""
+
+from operator import itemgetter
+import base64
+import hashlib
+import heapq
+import json
+import math
+import zlib
+
+import numpy as np
+
+class CountMinSketch:
+    """A depth x width table of counters indexed by `depth` hash functions.
+
+    Estimates never undercount. With probability 1 - delta they overcount by
+    at most epsilon * total, where epsilon = e / width and delta = e^-depth.
+    With conservative update, each insertion only raises the counters that
+    are below the new estimate, which tightens the estimates; the sum of two
+    such sketches is still a valid (non-undercounting) sketch.
+    """
+
+    def __init__(self, width, depth, seed=0, conservative=False):
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        self.conservative = conservative
+        self.total = 0
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self._rows = np.arange(depth)[:, None]
+
+    @classmethod
+    def from_error(cls, epsilon, delta, **kwargs):
+        """Smallest sketch with the given relative error and failure probability."""
+        return cls(math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta)), **kwargs)
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+
+    @property
+    def error_bound(self):
+        """Maximum overestimate of any count, holding with probability 1 - delta."""
+        return self.epsilon * self.total
+
+    def _columns(self, keys):
+        # Double hashing: row i uses h1 + i * h2, from one 128-bit digest per key
+        salt = self.seed.to_bytes(8, 'little')
+        digests = b''.join(hashlib.blake2b(key, digest_size=16, salt=salt).digest()
+                           for key in keys)
+        hashes = np.frombuffer(digests, dtype='<u8').reshape(-1, 2)
+        h1, h2 = hashes[:, 0], hashes[:, 1] | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((h1 + rows * h2) % np.uint64(self.width)).astype(np.intp)
+
+    def add(self, keys, counts):
+        """Add counts for distinct byte-string keys and return their new estimates."""
+        counts = np.asarray(counts, dtype=np.int64)
+        if not len(keys):
+            return counts
+        columns = self._columns(keys)
+        if self.conservative:
+            # Sequential by nature: a later key may share cells with an earlier one
+            for j in range(len(keys)):
+                cells = self.table[self._rows[:, 0], columns[:, j]]
+                np.maximum(cells, cells.min() + counts[j], out=cells)
+                self.table[self._rows[:, 0], columns[:, j]] = cells
+        else:
+            np.add.at(self.table, (self._rows, columns), counts)
+        self.total += int(counts.sum())
+        return self.table[self._rows, columns].min(axis=0)
+
+    def query(self, keys):
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        return self.table[self._rows, self._columns(keys)].min(axis=0)
+
+    def merge(self, other):
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError('Cannot merge sketches with different shapes or seeds')
+        self.table += other.table
+        self.total += other.total
+
+class SketchCounter:
+    """A Count-Min sketch plus the keys that currently look like the top k.
+
+    Only the sketch and at most 2k candidate keys are kept in memory. Keys are
+    byte strings; candidates are re-queried at the end, since estimates only
+    grow as more counts are added.
+    """
+
+    def __init__(self, sketch, k):
+        self.sketch = sketch
+        self.k = k
+        self.candidates = {}
+
+    def update(self, counts):
+        """Add a dict of pre-aggregated key counts."""
+        keys = list(counts)
+        estimates = self.sketch.add(keys, list(counts.values()))
+        self._track(zip(keys, estimates.tolist()))
+
+    def _track(self, estimated):
+        candidates = self.candidates
+        candidates.update(estimated)
+        if len(candidates) > 2 * self.k:
+            self.candidates = dict(heapq.nlargest(self.k, candidates.items(),
+                                                  key=itemgetter(1)))
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.candidates.update(other.candidates)
+
+    def top(self):
+        """The k largest (key, estimate) pairs."""
+        keys = list(self.candidates)
+        estimates = self.sketch.query(keys).tolist()
+        return heapq.nlargest(self.k, zip(keys, estimates), key=itemgetter(1))
+
+    def to_record(self):
+        """Serialize to a single-line JSON string."""
+        sketch = self.sketch
+        return json.dumps({
+            'width': sketch.width,
+            'depth': sketch.depth,
+            'seed': sketch.seed,
+            'conservative': sketch.conservative,
+            'total': sketch.total,
+            'k': self.k,
+            'table': base64.b64encode(zlib.compress(sketch.table.tobytes())).decode('ascii'),
+            'candidates': [key.decode('utf-8', errors='surrogateescape')
+                           for key in self.candidates],
+        })
+
+    @classmethod
+    def from_record(cls, record):
+        fields = json.loads(record)
+        sketch = CountMinSketch(fields['width'], fields['depth'], fields['seed'],
+                                fields['conservative'])
+        table = np.frombuffer(zlib.decompress(base64.b64decode(fields['table'])),
+                              dtype=np.int64)
+        sketch.table = table.reshape(sketch.depth, sketch.width).copy()
+        sketch.total = fields['total']
+        counter = cls(sketch, fields['k'])
+        counter.candidates = {key.encode('utf-8', errors='surrogateescape'): 0
+                              for key in fields['candidates']}
+        return counter
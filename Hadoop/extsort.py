@@ -0,0 +1,101 @@
+"""Helpers for spilling sorted runs of text records to disk and merging them."""
+
+from itertools import chain, groupby
+import heapq
+import os
+import tempfile
+
+# Most runs merged at once, like Hadoop's io.sort.factor: each open run costs
+# a file descriptor and a read buffer
+MERGE_FACTOR = 32
+
+def merge_factor():
+    """MERGE_FACTOR, lowered to leave room under the open file limit."""
+    try:
+        import resource
+    except ImportError:
+        # no per-process limit to query on this platform
+        return MERGE_FACTOR
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return MERGE_FACTOR
+    return max(2, min(MERGE_FACTOR, soft // 4))
+
+def record_key(line, separator=b'\t'):
+    """Key of a b'key<separator>value' record line."""
+    return line.split(separator, 1)[0]
+
+def spill_run(lines, directory, key=record_key):
+    """Sort the lines and write them to a new run file, returning its path.
+
+    With key=None the lines are written in their original order.
+    """
+    if key is not None:
+        lines.sort(key=key)
+    fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        f.writelines(lines)
+    return path
+
+def read_run(path):
+    with open(path, 'rb') as f:
+        yield from f
+
+def merge_runs(paths, key=record_key):
+    """Lazily k-way merge sorted run files into one sorted stream of lines."""
+    return heapq.merge(*(read_run(path) for path in paths), key=key)
+
+def premerge_runs(paths, directory, key=record_key, factor=None):
+    """Merge runs factor at a time until at most factor are left.
+
+    The merged runs are deleted and their merges written to new runs in
+    directory. Returns the paths left, for a final merge_runs() that stays
+    under the open file limit. factor defaults to merge_factor().
+    """
+    factor = factor or merge_factor()
+    paths = list(paths)
+    while len(paths) > factor:
+        batch, paths = paths[:factor], paths[factor:]
+        paths.append(spill_run(merge_runs(batch, key), directory, key=None))
+        for path in batch:
+            os.remove(path)
+    return paths
+
+def concat_runs(paths):
+    """Stream unsorted run files one after another."""
+    return chain.from_iterable(read_run(path) for path in paths)
+
+def sum_sorted_counts(lines, separator=b'\t'):
+    """Sum the counts of a key-sorted stream of b'key<separator>count' lines.
+
+    Yields one (key, total) pair per key.
+    """
+    records = (line.rstrip(b'\r\n').split(separator, 1) for line in lines)
+    for key, group in groupby(records, key=lambda record: record[0]):
+        yield key, sum(int(count) for _, count in group)
+
+def count_order(line):
+    """Sort key of a b'word<TAB>count' line: descending count, then word."""
+    word, _, count = line.rstrip(b'\r\n').partition(b'\t')
+    return -int(count), word
+
+def sort_by_count(records, max_records, tmp_dir=None):
+    """Yield the records in count order, spilling sorted runs of max_records.
+
+    The runs are merged at most merge_factor() at a time.
+    """
+    with tempfile.TemporaryDirectory(prefix='count-order-', dir=tmp_dir) as work_dir:
+        runs = []
+        buffer = []
+        for line in records:
+            buffer.append(line)
+            if len(buffer) >= max_records:
+                runs.append(spill_run(buffer, work_dir, key=count_order))
+                buffer = []
+        if not runs:
+            buffer.sort(key=count_order)
+            yield from buffer
+            return
+        runs.append(spill_run(buffer, work_dir, key=count_order))
+        runs = premerge_runs(runs, work_dir, key=count_order)
+        yield from merge_runs(runs, key=count_order)
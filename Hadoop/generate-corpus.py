@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Generate a reproducible synthetic text corpus with Zipf-distributed words.
+
+The output is built from fixed-size chunks, each drawn from its own seeded
+random stream, so the same arguments produce the same file no matter how many
+worker processes generate it.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+import argparse
+import math
+import random
+import string
+import sys
+import time
+
+CHUNK_SIZE = 64 * 1024 * 1024
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+def parse_size(text):
+    """Parse sizes like 512M or 10G (binary units)."""
+    text = text.strip().upper().rstrip('B')
+    unit = text[-1] if text and text[-1] in SIZE_UNITS else ''
+    return int(float(text[:len(text) - len(unit)]) * SIZE_UNITS[unit])
+
+def make_vocabulary(size, seed, min_length=2, max_length=12):
+    """Distinct random lowercase words, in Zipf rank order."""
+    rng = random.Random(f'{seed}:vocabulary')
+    words = set()
+    while len(words) < size:
+        length = rng.randint(min_length, max_length)
+        words.add(''.join(rng.choices(string.ascii_lowercase, k=length)))
+    vocabulary = sorted(words)
+    rng.shuffle(vocabulary)
+    return vocabulary
+
+def zipf_cum_weights(size, exponent):
+    return list(accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+
+def generate_chunk(index, chunk_bytes, vocabulary, cum_weights, seed, min_words, max_words):
+    """Generate whole lines until the chunk holds at least chunk_bytes bytes."""
+    rng = random.Random(f'{seed}:{index}')
+    lines = []
+    written = 0
+    while written < chunk_bytes:
+        words = rng.choices(vocabulary, cum_weights=cum_weights,
+                            k=rng.randint(min_words, max_words))
+        line = ' '.join(words) + '\n'
+        lines.append(line)
+        written += len(line)
+    return ''.join(lines).encode('ascii')
+
+def generate(output, size, vocabulary_size, exponent, min_words, max_words, seed, workers):
+    vocabulary = make_vocabulary(vocabulary_size, seed)
+    cum_weights = zipf_cum_weights(vocabulary_size, exponent)
+    chunks = math.ceil(size / CHUNK_SIZE)
+    chunk_sizes = [min(CHUNK_SIZE, size - i * CHUNK_SIZE) for i in range(chunks)]
+    with open(output, 'wb') as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        for data in pool.map(generate_chunk, range(chunks), chunk_sizes,
+                             [vocabulary] * chunks, [cum_weights] * chunks,
+                             [seed] * chunks, [min_words] * chunks, [max_words] * chunks):
+            f.write(data)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Zipf text corpus.')
+    parser.add_argument('output', help='output file')
+    parser.add_argument('-s', '--size', type=parse_size, default='1G',
+                        help='approximate output size, e.g. 1G, 5G, 10G (default: 1G)')
+    parser.add_argument('-v', '--vocabulary', type=int, default=100000,
+                        help='number of distinct words (default: 100000)')
+    parser.add_argument('-z', '--zipf', type=float, default=1.1,
+                        help='Zipf exponent of the word frequencies (default: 1.1)')
+    parser.add_argument('--min-words', type=int, default=5,
+                        help='minimum words per line (default: 5)')
+    parser.add_argument('--max-words', type=int, default=20,
+                        help='maximum words per line (default: 20)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='generator processes (default: CPU count)')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    start_time = time.perf_counter()
+    generate(args.output, args.size, args.vocabulary, args.zipf,
+             args.min_words, args.max_words, args.seed, args.workers)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"Elapsed time: {elapsed:.6f} seconds", file=sys.stderr)
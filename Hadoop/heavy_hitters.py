@@ -0,0 +1,65 @@
+"""Space-Saving heavy-hitters summary with a fixed number of counters."""
+
+from operator import itemgetter
+import heapq
+
+class SpaceSaving:
+    """Approximate counts of the most frequent keys in at most `capacity` slots.
+
+    Every monitored key has a count and an error with
+    count - error <= true count <= count, and every key whose true count
+    exceeds total / capacity is guaranteed to be monitored. Updates may carry
+    a weight, so blocks of tokens can be pre-aggregated before being fed in.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # One (count, key) entry per monitored key. Counts only grow, so an
+        # entry is a lower bound of the key's count and is refreshed lazily
+        # when it reaches the top of the heap.
+        self._heap = []
+
+    def update(self, key, weight=1):
+        self.total += weight
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+        elif len(counts) < self.capacity:
+            counts[key] = weight
+            self.errors[key] = 0
+            heapq.heappush(self._heap, (weight, key))
+        else:
+            floor, victim = self._pop_min()
+            del counts[victim]
+            del self.errors[victim]
+            counts[key] = floor + weight
+            self.errors[key] = floor
+            heapq.heappush(self._heap, (floor + weight, key))
+
+    def update_counts(self, counts):
+        for key, weight in counts.items():
+            self.update(key, weight)
+
+    def _pop_min(self):
+        heap = self._heap
+        while True:
+            count, key = heap[0]
+            current = self.counts[key]
+            if count == current:
+                heapq.heappop(heap)
+                return count, key
+            heapq.heapreplace(heap, (current, key))
+
+    @property
+    def max_error(self):
+        """Upper bound on the overestimate of any reported count."""
+        return max(self.errors.values(), default=0)
+
+    def top(self, k):
+        """The k largest (key, count, error) triples, by estimated count."""
+        return heapq.nlargest(k, ((key, count, self.errors[key])
+                                  for key, count in self.counts.items()),
+                              key=itemgetter(1))
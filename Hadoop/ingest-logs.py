@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Append the timings found in raw benchmark logs to results.csv.
+
+Logs are read line by line in a single pass (gzip and bzip2 logs too) and
+may mix these formats:
+
+    Seq 1G 2 nodes             section header: engine, dataSize, cluster
+    51.209039s                 a run timed by the program itself
+    Elapsed time: 51.2 seconds the engines' own report
+    real    1m15.007s          a run timed by time(1); user and sys are ignored
+    Hadoop job: job_..._0001   `mapred job -history` output: the run takes
+    Submitted At: ...          from submission to finish, recorded when its
+    Finished At: ...           Status line is SUCCEEDED
+    Status: SUCCEEDED
+
+Each run is tagged from its section header. The cluster is identified by its
+node count (--cluster): single-node engines like seq report the cores of one
+node, the others the cores of the whole cluster, and the confId is
+<engine>_<cluster name>, as in the rows transcribed so far. Runs already in
+the results file, or seen twice in the logs, are skipped, so logs can be
+ingested again as they grow.
+"""
+
+from datetime import datetime
+import argparse
+import csv
+import os
+import re
+import sys
+
+from results_csv import FIELDS, open_results
+import compression
+
+HISTORY_TIME_FORMAT = '%d-%b-%Y %H:%M:%S'
+
+HEADER_PATTERN = re.compile(r'^(\w+)\s+([\d.]+[KMGT]?)\s+(\d+)\s+nodes?$', re.IGNORECASE)
+SECONDS_PATTERN = re.compile(r'^([\d.]+)s$')
+ELAPSED_PATTERN = re.compile(r'^Elapsed time: ([\d.]+) seconds$')
+REAL_PATTERN = re.compile(r'^real\s+(?:(\d+)m)?([\d.]+)s$')
+JOB_PATTERN = re.compile(r'^Hadoop job: (\S+)$')
+HISTORY_PATTERN = re.compile(r'^(Submitted|Finished) At: (\d+-\w+-\d+ \d+:\d+:\d+)')
+STATUS_PATTERN = re.compile(r'^Status: (\w+)$')
+
+def parse_cluster(text):
+    """NODES=NAME:CORES_PER_NODE, e.g. 2=strong:16."""
+    match = re.fullmatch(r'(\d+)=(\w+):(\d+)', text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected NODES=NAME:CORES_PER_NODE, got '{text}'")
+    return int(match[1]), (match[2], int(match[3]))
+
+def parse_runs(lines):
+    """Yield (engine, dataSize, nodes, seconds, job id or None) for each run."""
+    section = None
+    job = {}
+    for line in lines:
+        line = line.strip()
+        match = HEADER_PATTERN.match(line)
+        if match:
+            section = (match[1].lower(), match[2].upper(), int(match[3]))
+            continue
+        seconds = None
+        match = SECONDS_PATTERN.match(line) or ELAPSED_PATTERN.match(line)
+        if match:
+            seconds = match[1]
+        elif REAL_PATTERN.match(line):
+            match = REAL_PATTERN.match(line)
+            seconds = f'{int(match[1] or 0) * 60 + float(match[2]):.3f}'
+        elif JOB_PATTERN.match(line):
+            job = {'id': JOB_PATTERN.match(line)[1]}
+        elif HISTORY_PATTERN.match(line):
+            match = HISTORY_PATTERN.match(line)
+            job[match[1]] = datetime.strptime(match[2], HISTORY_TIME_FORMAT)
+        elif STATUS_PATTERN.match(line) and 'Finished' in job and 'Submitted' in job:
+            if STATUS_PATTERN.match(line)[1] == 'SUCCEEDED':
+                seconds = f"{(job['Finished'] - job['Submitted']).total_seconds():.3f}"
+        if seconds is None:
+            continue
+        if section is None:
+            raise ValueError(f"run of {seconds} s before any section header")
+        yield section + (seconds, job.get('id') if 'Finished' in job else None)
+        job = {}
+
+def read_logs(paths):
+    for path in paths:
+        if path == '-':
+            yield from compression.open_text(sys.stdin)
+            continue
+        # closing the decompressing wrapper of a compressed log leaves the file open
+        with open(path, encoding='utf-8') as stream, compression.open_text(stream) as f:
+            yield from f
+
+def existing_runs(path):
+    """Rows already in the results file, as (nCores, confId, dataSize, time) keys."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='') as f:
+        return {(int(row['nCores']), row['confId'], row['dataSize'], float(row['time']))
+                for row in csv.DictReader(f, skipinitialspace=True)}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Append timings from raw logs to results.csv.')
+    parser.add_argument('logs', nargs='+', help="log files, or - for standard input")
+    parser.add_argument('-o', '--results', default='results.csv',
+                        help='CSV file to append to (default: results.csv)')
+    parser.add_argument('--cluster', type=parse_cluster, action='append',
+                        metavar='NODES=NAME:CORES_PER_NODE',
+                        help='cluster of a node count (default: 2=strong:16 and 4=weak:8)')
+    parser.add_argument('--single-node', default='seq',
+                        help='comma-separated engines running on one node (default: seq)')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='print the new rows instead of appending them')
+    args = parser.parse_args()
+    args.cluster = dict(args.cluster or [(2, ('strong', 16)), (4, ('weak', 8))])
+    args.single_node = set(args.single_node.split(','))
+    return args
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    seen = existing_runs(args.results)
+    jobs = set()
+    if args.dry_run:
+        f = sys.stdout
+        writer = csv.DictWriter(f, fieldnames=FIELDS, lineterminator='\n')
+    else:
+        f, writer = open_results(args.results)
+    added = duplicates = 0
+    with f:
+        for engine, size, nodes, seconds, job_id in parse_runs(read_logs(args.logs)):
+            if nodes not in args.cluster:
+                sys.exit(f"no --cluster for {nodes} nodes ({engine} {size})")
+            name, cores_per_node = args.cluster[nodes]
+            cores = cores_per_node if engine in args.single_node else cores_per_node * nodes
+            key = (cores, f'{engine}_{name}', size, float(seconds))
+            if key in seen or (job_id is not None and job_id in jobs):
+                duplicates += 1
+                continue
+            seen.add(key)
+            jobs.add(job_id)
+            writer.writerow(dict(zip(FIELDS, key[:3] + (seconds,))))
+            f.flush()
+            added += 1
+    print(f"Appended {added} runs, skipped {duplicates} duplicates", file=sys.stderr)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Run a streaming mapper/reducer pair locally, the way Hadoop streaming would.
+
+The input is split into newline-aligned shards, one mapper process per shard.
+Mapper output is partitioned by key hash into R partitions, and every spill of
+each partition is sorted and written to a run file. Reduce task r k-way merges
+its runs and pipes them into its own reducer process. The results land in
+<output>/part-NNNNN files.
+
+With --no-sort the runs are left unsorted and simply concatenated for the
+reducer, which then has to aggregate by hash (reducer-adv.py --hash).
+
+Like Hadoop streaming, the key is the first --key-fields tab-separated fields
+of a record. --partitioner keyfield partitions on the first field the way
+KeyFieldBasedPartitioner -k1,1 does, for mapper-adv.py --partitions.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+from partitioner import keyfield_partition
+from sequential import split_ranges
+import extsort
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+COPY_BLOCK = 1024 * 1024
+
+def build_command(command):
+    """Split a command line, running bare *.py scripts with this interpreter."""
+    argv = shlex.split(command)
+    if argv and argv[0].endswith('.py'):
+        script = Path(argv[0])
+        if not script.exists():
+            script = SCRIPT_DIR / script
+        argv = [sys.executable, str(script)] + argv[1:]
+    return argv
+
+def key_of(line, fields=1):
+    """The first `fields` tab-separated fields of a record line."""
+    return tuple(line.rstrip(b'\n').split(b'\t', fields)[:fields])
+
+def partition_of(key, reducers, partitioner='hash'):
+    if partitioner == 'keyfield':
+        return keyfield_partition(key[0].decode('utf-8', errors='surrogateescape'), reducers)
+    # crc32 is stable across processes and runs, unlike the salted hash()
+    return zlib.crc32(b'\t'.join(key)) % reducers
+
+def _feed_range(pipe, filename, start, end):
+    with open(filename, 'rb') as f, pipe:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(COPY_BLOCK, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            pipe.write(block)
+
+def run_map_task(filename, start, end, mapper, reducers, spill_records, tmp_dir,
+                 sort=True, key_fields=1, partitioner='hash'):
+    """Map one shard and return the run files of each partition."""
+    key = partial(key_of, fields=key_fields)
+    # Hadoop streaming tells the mapper its input file in this variable
+    env = dict(os.environ, mapreduce_map_input_file=str(Path(filename).resolve()))
+    proc = subprocess.Popen(mapper, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+    feeder = threading.Thread(target=_feed_range, args=(proc.stdin, filename, start, end))
+    feeder.start()
+
+    runs = [[] for _ in range(reducers)]
+    buffers = [[] for _ in range(reducers)]
+    buffered = 0
+    for line in proc.stdout:
+        if not line.endswith(b'\n'):
+            line += b'\n'
+        buffers[partition_of(key(line), reducers, partitioner)].append(line)
+        buffered += 1
+        if buffered >= spill_records:
+            _spill(buffers, runs, tmp_dir, key if sort else None)
+            buffered = 0
+    _spill(buffers, runs, tmp_dir, key if sort else None)
+
+    feeder.join()
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, mapper)
+    return runs
+
+def _spill(buffers, runs, tmp_dir, key):
+    for partition, lines in enumerate(buffers):
+        if lines:
+            runs[partition].append(extsort.spill_run(lines, tmp_dir, key=key))
+            buffers[partition] = []
+
+def run_reduce_task(run_paths, reducer, output_path, tmp_dir, sort=True, key_fields=1):
+    """Merge the runs of one partition and pipe them through the reducer.
+
+    Runs are merged a few at a time first, so that many spills do not run
+    into the open file limit.
+    """
+    if sort:
+        key = partial(key_of, fields=key_fields)
+        run_paths = extsort.premerge_runs(run_paths, tmp_dir, key=key)
+        records = extsort.merge_runs(run_paths, key=key)
+    else:
+        records = extsort.concat_runs(run_paths)
+    with open(output_path, 'wb') as out:
+        proc = subprocess.Popen(reducer, stdin=subprocess.PIPE, stdout=out)
+        with proc.stdin:
+            proc.stdin.writelines(records)
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, reducer)
+    return output_path
+
+def run_job(input_path, output_dir, mapper, reducer, maps, reducers,
+            spill_records, tmp_dir=None, sort=True, key_fields=1, partitioner='hash'):
+    """Run the whole job and return (map_seconds, reduce_seconds)."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True)
+    shards = split_ranges(input_path, maps)
+
+    with tempfile.TemporaryDirectory(prefix='local-runner-', dir=tmp_dir) as work_dir, \
+            ProcessPoolExecutor(max_workers=max(maps, reducers)) as pool:
+        map_start = time.perf_counter()
+        futures = [pool.submit(run_map_task, input_path, start, end, mapper,
+                               reducers, spill_records, work_dir, sort,
+                               key_fields, partitioner)
+                   for start, end in shards]
+        partition_runs = [[] for _ in range(reducers)]
+        for future in futures:
+            for partition, runs in enumerate(future.result()):
+                partition_runs[partition].extend(runs)
+        map_seconds = time.perf_counter() - map_start
+
+        reduce_start = time.perf_counter()
+        futures = [pool.submit(run_reduce_task, runs, reducer,
+                               output_dir / f'part-{partition:05d}', work_dir,
+                               sort, key_fields)
+                   for partition, runs in enumerate(partition_runs)]
+        for future in futures:
+            future.result()
+        reduce_seconds = time.perf_counter() - reduce_start
+
+    (output_dir / '_SUCCESS').touch()
+    return map_seconds, reduce_seconds
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run a streaming MapReduce job locally.')
+    parser.add_argument('input', help='input file')
+    parser.add_argument('output', help='output directory (must not exist)')
+    parser.add_argument('-m', '--maps', type=int, default=os.cpu_count(),
+                        help='number of input shards / mapper processes (default: CPU count)')
+    parser.add_argument('-r', '--reducers', type=int, default=1,
+                        help='number of partitions / reducer processes (default: 1)')
+    parser.add_argument('--mapper', default='mapper-adv.py',
+                        help='mapper command (default: mapper-adv.py)')
+    parser.add_argument('--reducer',
+                        help='reducer command (default: reducer-adv.py, '
+                             'or reducer-adv.py --hash with --no-sort)')
+    parser.add_argument('--no-sort', action='store_true',
+                        help='skip sorting the spilled runs and the merge')
+    parser.add_argument('--key-fields', type=int, default=1,
+                        help='leading tab-separated fields that form the key (default: 1)')
+    parser.add_argument('--partitioner', choices=['hash', 'keyfield'], default='hash',
+                        help='hash: crc32 of the key (default); keyfield: Hadoop '
+                             'KeyFieldBasedPartitioner hash of the first field')
+    parser.add_argument('--spill-records', type=int, default=1000000,
+                        help='mapper output records buffered per spill (default: 1000000)')
+    parser.add_argument('--tmp-dir', help='directory for spilled runs (default: system temp)')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.reducer is None:
+        args.reducer = 'reducer-adv.py --hash' if args.no_sort else 'reducer-adv.py'
+    if os.path.exists(args.output):
+        print(f"Output directory {args.output} already exists", file=sys.stderr)
+        sys.exit(1)
+
+    start_time = time.perf_counter()
+    map_seconds, reduce_seconds = run_job(
+        args.input, args.output, build_command(args.mapper), build_command(args.reducer),
+        args.maps, args.reducers, args.spill_records, args.tmp_dir, not args.no_sort,
+        args.key_fields, args.partitioner)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"Map phase: {map_seconds:.6f} seconds", file=sys.stderr)
+    print(f"Reduce phase: {reduce_seconds:.6f} seconds", file=sys.stderr)
+    print(f"Elapsed time: {elapsed:.6f} seconds", file=sys.stderr)
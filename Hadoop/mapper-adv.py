@@ -1,24 +1,198 @@
 #!/usr/bin/env python
 """A more advanced Mapper, using Python iterators and generators."""
 
+from itertools import islice
+from operator import itemgetter
+import argparse
+import heapq
 import sys
 
-def read_input(file):
-    for line in file:
-        # split the line into words
-        yield line.split()
+# Key of the single record a mapper emits in --sketch mode, so that all
+# sketches meet in one reducer
+SKETCH_KEY = '__cms__'
 
-def main(separator='\t'):
-    # input comes from STDIN (standard input)
-    data = read_input(sys.stdin)
+# Share of the table evicted at once when the in-mapper combiner is full,
+# so eviction cost is amortized over many insertions
+EVICT_FRACTION = 0.1
+
+def read_input(file, reporter=None):
+    if reporter is None:
+        for line in file:
+            # split the line into words
+            yield line.split()
+        return
+    from counters import line_bytes
+
+    # count a batch of lines at a time, so the counters cost little per line
+    while True:
+        reporter.phase('read')
+        lines = list(islice(file, reporter.batch))
+        if not lines:
+            return
+        reporter.incr('Records read', len(lines))
+        reporter.incr('Bytes read', line_bytes(''.join(lines)))
+        if reporter.timings is None:
+            # split the lines into words, one at a time, which is cheaper
+            # than holding a batch of word lists
+            tokens = 0
+            for line in lines:
+                words = line.split()
+                tokens += len(words)
+                yield words
+            reporter.incr('Tokens', tokens)
+            continue
+        reporter.phase('tokenize')
+        batch = [line.split() for line in lines]
+        reporter.incr('Tokens', sum(map(len, batch)))
+        reporter.phase('aggregate')
+        yield from batch
+
+def count_ones(data):
+    for words in data:
+        for word in words:
+            yield word, 1
+
+def combine(data, max_entries, evict='lru'):
+    """In-mapper combining: aggregate counts in a table of at most max_entries.
+
+    When the table is full, a batch of entries is emitted and evicted, either
+    the least recently used ('lru') or the ones with the lowest count ('lfu').
+    Everything left is flushed at the end of the input.
+    """
+    counts = {}
+    batch = max(1, int(max_entries * EVICT_FRACTION))
+    for words in data:
+        for word in words:
+            if evict == 'lru':
+                # dicts keep insertion order, so re-inserting a word moves it
+                # to the most recently used end
+                counts[word] = counts.pop(word, 0) + 1
+            else:
+                counts[word] = counts.get(word, 0) + 1
+            if len(counts) > max_entries:
+                if evict == 'lru':
+                    victims = [(w, counts[w]) for w, _ in zip(counts, range(batch))]
+                else:
+                    victims = heapq.nsmallest(batch, counts.items(), key=itemgetter(1))
+                for victim, count in victims:
+                    del counts[victim]
+                    yield victim, count
+    yield from counts.items()
+
+def sketch(data, k, epsilon, delta, conservative=False, batch=100000):
+    """Count all words into a Count-Min sketch and return it as one record.
+
+    Words are pre-aggregated in batches of up to `batch` distinct words, and
+    the record carries the sketch plus the words likely to be in the top k.
+    """
+    # NumPy is only needed by this mode
+    from countmin import CountMinSketch, SketchCounter
+
+    counter = SketchCounter(CountMinSketch.from_error(epsilon, delta,
+                                                      conservative=conservative), k)
+    counts = {}
     for words in data:
-        # write the results to STDOUT (standard output);
-        # what we output here will be the input for the
-        # Reduce step, i.e. the input for reducer.py
-        #
-        # tab-delimited; the trivial word count is 1
         for word in words:
-            print('%s%s%d' % (word, separator, 1))
+            counts[word] = counts.get(word, 0) + 1
+        if len(counts) >= batch:
+            counter.update(_encode_keys(counts))
+            counts = {}
+    counter.update(_encode_keys(counts))
+    return counter.to_record()
+
+def _encode_keys(counts):
+    return {word.encode('utf-8', errors='surrogateescape'): count
+            for word, count in counts.items()}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Word count mapper.')
+    parser.add_argument('--combine', action='store_true',
+                        help='aggregate counts in the mapper before emitting them')
+    parser.add_argument('--max-entries', type=int, default=100000,
+                        help='combiner table size cap, also the distinct words '
+                             'pre-aggregated per sketch update (default: 100000)')
+    parser.add_argument('--evict', choices=['lru', 'lfu'], default='lru',
+                        help='combiner eviction policy: least recently used '
+                             'or lowest count (default: lru)')
+    parser.add_argument('--sketch', action='store_true',
+                        help='emit one Count-Min sketch record instead of word counts '
+                             '(reduce with reducer-adv.py --sketch; needs NumPy)')
+    parser.add_argument('--top', type=int, default=1000,
+                        help='candidate top words carried with the sketch (default: 1000)')
+    parser.add_argument('--epsilon', type=float, default=1e-5,
+                        help='sketch error as a fraction of all tokens (default: 1e-5)')
+    parser.add_argument('--delta', type=float, default=0.01,
+                        help='probability of exceeding the sketch error (default: 0.01)')
+    parser.add_argument('--conservative', action='store_true',
+                        help='use conservative update for tighter sketch estimates')
+    parser.add_argument('--partitions', metavar='FILE',
+                        help='prefix every record with its partition label from a '
+                             'partitioner.py partition file, salting hot words')
+    parser.add_argument('--counters', action='store_true',
+                        help='report Hadoop streaming counters and status on stderr')
+    parser.add_argument('--timing', action='store_true',
+                        help='with --counters, also report the time spent reading, '
+                             'tokenizing, aggregating and writing')
+    parser.add_argument('--report-interval', type=float, default=10.0,
+                        help='seconds between counter reports (default: 10)')
+    return parser.parse_args()
+
+def emit(records, template, reporter=None):
+    if reporter is None:
+        for record in records:
+            print(template % record)
+        return
+    while True:
+        reporter.phase('aggregate')
+        batch = list(islice(records, reporter.batch))
+        if not batch:
+            break
+        reporter.phase('write')
+        for record in batch:
+            print(template % record)
+        reporter.incr('Records emitted', len(batch))
+    reporter.close()
+
+def main(separator='\t'):
+    args = parse_args()
+    reporter = None
+    if args.counters:
+        # the counters module only has to be shipped with jobs that use it
+        from counters import Reporter
+
+        reporter = Reporter('Mapper', 'Records read', args.report_interval, args.timing)
+    # input comes from STDIN (standard input), possibly gzip- or bzip2-compressed
+    try:
+        # jobs that only read plain text need not ship the compression module
+        from compression import open_text
+    except ImportError:
+        stdin = sys.stdin
+    else:
+        stdin = open_text(sys.stdin)
+    data = read_input(stdin, reporter)
+    if args.sketch:
+        record = sketch(data, args.top, args.epsilon, args.delta, args.conservative,
+                        args.max_entries)
+        emit([(SKETCH_KEY, record)], separator.join(['%s', '%s']), reporter)
+        return
+    if args.combine:
+        pairs = combine(data, args.max_entries, args.evict)
+    else:
+        pairs = count_ones(data)
+    # write the results to STDOUT (standard output);
+    # what we output here will be the input for the
+    # Reduce step, i.e. the input for reducer.py
+    #
+    # tab-delimited; the trivial word count is 1,
+    # the combined word count is the partial sum
+    if args.partitions:
+        from partitioner import Partitioner
+
+        partitioner = Partitioner.load(args.partitions)
+        labelled = ((partitioner.label(word), word, count) for word, count in pairs)
+        emit(labelled, separator.join(['%s', '%s', '%d']), reporter)
+    else:
+        emit(pairs, separator.join(['%s', '%d']), reporter)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Mapper computing several text statistics in one pass (see aggregates.py).
+
+Records are `aggregate<TAB>item<TAB>count`, so the key is two fields:
+
+    -D stream.num.map.output.key.fields=2
+    -reducer reducer-stats.py
+
+(local-runner.py --key-fields 2 --reducer reducer-stats.py does the same).
+"""
+
+import argparse
+import os
+import sys
+
+from aggregates import AGGREGATES, TextStats, parse_aggregates
+import compression
+
+# Approximate characters of input tokenized at once
+BLOCK_HINT = 1024 * 1024
+
+def read_blocks(file):
+    while True:
+        lines = file.readlines(BLOCK_HINT)
+        if not lines:
+            return
+        yield ''.join(lines)
+
+def input_file():
+    """Name of the file this map task reads, as set by Hadoop streaming."""
+    return os.environ.get('mapreduce_map_input_file', os.environ.get('map_input_file', '-'))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compute text statistics in one pass.')
+    parser.add_argument('-a', '--aggregates', type=parse_aggregates, default=','.join(AGGREGATES),
+                        help=f"comma-separated aggregates (default: {','.join(AGGREGATES)})")
+    parser.add_argument('-n', '--ngram', type=int, default=2,
+                        help='words per n-gram (default: 2)')
+    parser.add_argument('--max-entries', type=int, default=1000000,
+                        help='partial counts kept before they are emitted (default: 1000000)')
+    return parser.parse_args()
+
+def emit(stats, separator='\t'):
+    template = separator.join(['%s', '%s', '%d']) + '\n'
+    sys.stdout.writelines(template % record for record in stats.records())
+    stats.clear()
+
+def main():
+    args = parse_args()
+    source = input_file()
+    stats = TextStats(args.aggregates, args.ngram)
+    # input comes from STDIN (standard input), possibly gzip- or bzip2-compressed
+    for block in read_blocks(compression.open_text(sys.stdin)):
+        stats.update(block, source)
+        if stats.entries() > args.max_entries:
+            emit(stats)
+    emit(stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Merge reducer part files into one result ordered by descending count.
+
+This produces the same listing as sequential.py (most_common() order) from
+the unordered part-* files of a job, with words of equal count ordered by
+their bytes. Records are sorted in runs of at most --max-records and k-way
+merged, so memory stays bounded whatever the vocabulary size. --top N only
+keeps a heap of the N largest records instead.
+"""
+
+from pathlib import Path
+import argparse
+import heapq
+import sys
+import time
+
+import extsort
+
+def read_records(paths):
+    for path in paths:
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    line += b'\n'
+                yield line
+
+def top_by_count(records, n):
+    return heapq.nsmallest(n, records, key=extsort.count_order)
+
+def expand_paths(paths):
+    """Replace job output directories by their part-* files."""
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob('part-*')) if path.is_dir() else [path])
+    return files
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Merge reducer outputs ordered by count.')
+    parser.add_argument('parts', nargs='+', help='part files or job output directories')
+    parser.add_argument('-o', '--output', help='result file (default: stdout)')
+    parser.add_argument('-n', '--top', type=int, help='keep only the N most common words')
+    parser.add_argument('--max-records', type=int, default=1000000,
+                        help='records sorted in memory per run (default: 1000000)')
+    parser.add_argument('--tmp-dir', help='directory for sorted runs (default: system temp)')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    start_time = time.perf_counter()
+    records = read_records(expand_paths(args.parts))
+    if args.top is not None:
+        ordered = top_by_count(records, args.top)
+    else:
+        ordered = extsort.sort_by_count(records, args.max_records, args.tmp_dir)
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    with out:
+        out.writelines(ordered)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"Elapsed time: {elapsed:.6f} seconds", file=sys.stderr)
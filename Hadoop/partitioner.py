@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Sampling range partitioner with hot-key salting for the streaming job.
+
+`partitioner.py sample` reads random blocks of the input and writes a
+partition file: the hot words that would overload a reducer on their own,
+each spread over the least-loaded partitions, plus split points that top
+every reducer up to about the same sampled load. With
+`mapper-adv.py --partitions FILE` every record is prefixed with the label of
+its partition, and hot words rotate over their partitions (salting). The
+labels are chosen so that Hadoop's KeyFieldBasedPartitioner sends label r to
+reducer r, so run the job with:
+
+    -D stream.num.map.output.key.fields=2
+    -D mapreduce.partition.keypartitioner.options=-k1,1
+    -partitioner org.apache.hadoop.mapred.lib.KeyFieldBasedPartitioner
+    -reducer 'reducer-adv.py --partitioned'
+
+(local-runner.py --key-fields 2 --partitioner keyfield does the same). A hot
+word then has one partial count in each of its reducers' outputs, which
+`partitioner.py merge` adds up in a small second pass over the part files.
+"""
+
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+import argparse
+import json
+import math
+import os
+import random
+import sys
+
+import compression
+
+def keyfield_partition(label, reducers):
+    """Partition of Hadoop's KeyFieldBasedPartitioner for a first key field.
+
+    Mirrors its Java hash: h = 31 * h + b over the signed UTF-8 bytes, in
+    32-bit arithmetic, then (h & Integer.MAX_VALUE) % reducers.
+    """
+    h = 0
+    for b in label.encode('utf-8'):
+        h = (31 * h + (b - 256 if b > 127 else b)) & 0xFFFFFFFF
+    return (h & 0x7FFFFFFF) % reducers
+
+def make_labels(reducers):
+    """One short label per partition r that KeyFieldBasedPartitioner maps to r."""
+    labels = []
+    for r in range(reducers):
+        label, suffix = f'p{r}', 0
+        while keyfield_partition(label, reducers) != r:
+            label, suffix = f'p{r}_{suffix}', suffix + 1
+        labels.append(label)
+    return labels
+
+class Partitioner:
+    """Maps words to partition labels, salting the hot ones."""
+
+    def __init__(self, reducers, splits, hot, labels=None):
+        self.reducers = reducers
+        self.splits = splits
+        self.hot = hot
+        self.labels = labels or make_labels(reducers)
+        self._next_salt = {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            fields = json.load(f)
+        return cls(fields['reducers'], fields['splits'], fields['hot'], fields['labels'])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'reducers': self.reducers, 'labels': self.labels,
+                       'splits': self.splits, 'hot': self.hot}, f, indent=1)
+
+    def partition(self, word):
+        return min(bisect_left(self.splits, word), self.reducers - 1)
+
+    def label(self, word):
+        """Label of the partition the next record of `word` goes to."""
+        partitions = self.hot.get(word)
+        if partitions is None:
+            return self.labels[self.partition(word)]
+        # Round-robin over the word's partitions
+        salt = self._next_salt.get(word, 0)
+        self._next_salt[word] = (salt + 1) % len(partitions)
+        return self.labels[partitions[salt]]
+
+def sample_words(path, samples, block_size, seed=0):
+    """Count the words in `samples` randomly placed blocks of the input.
+
+    Compressed inputs cannot be read at random offsets, so their sample is
+    the first samples * block_size bytes instead.
+    """
+    sample = Counter()
+    fmt = compression.detect_file_format(path)
+    if fmt is not None:
+        remaining = samples * block_size
+        for chunk in compression.iter_members(path, fmt):
+            sample.update(chunk[:remaining].decode('utf-8', errors='ignore').split())
+            remaining -= len(chunk)
+            if remaining <= 0:
+                break
+        return sample
+
+    size = os.path.getsize(path)
+    rng = random.Random(seed)
+    with open(path, 'rb') as f:
+        if size <= samples * block_size:
+            sample.update(f.read().decode('utf-8', errors='ignore').split())
+            return sample
+        for offset in sorted(rng.randrange(size) for _ in range(samples)):
+            f.seek(offset)
+            f.readline()  # skip to the next full line
+            block = f.read(block_size)
+            block = block[:block.rfind(b'\n') + 1]
+            sample.update(block.decode('utf-8', errors='ignore').split())
+    return sample
+
+def build_partitioner(sample, reducers, hot_fraction=0.5):
+    """Balance the sampled load of `sample` over the reducers.
+
+    A word is hot if it alone carries more than hot_fraction of an even
+    reducer share; it is salted over enough partitions to bring each salt
+    below that. Hot words are placed first, largest salts first, each on
+    the partitions with the least load so far. The remaining words are
+    then cut into key ranges that fill every partition up to an even share;
+    a partition already over it by its hot load gets an empty range.
+    """
+    total = sum(sample.values())
+    share = total / reducers
+    salts = {}
+    for word, count in sample.items():
+        n = min(reducers, math.ceil(count / share / hot_fraction))
+        if n > 1:
+            salts[word] = n
+
+    load = [0.0] * reducers
+    hot = {}
+    for word in sorted(salts, key=lambda word: sample[word] / salts[word], reverse=True):
+        partitions = sorted(range(reducers), key=load.__getitem__)[:salts[word]]
+        for partition in partitions:
+            load[partition] += sample[word] / salts[word]
+        hot[word] = sorted(partitions)
+
+    rest = sorted((word, count) for word, count in sample.items() if word not in hot)
+    # Sampled weight of the words up to and including each word
+    prefix = list(accumulate(count for _, count in rest))
+    room = [max(share - hot_load, 0.0) for hot_load in load]
+    scale = prefix[-1] / sum(room) if rest and sum(room) else 0.0
+    splits = []
+    bound = 0.0
+    for partition_room in room[:-1] if rest else []:
+        # End the range at the word whose cumulative weight is closest to
+        # where this partition's room runs out
+        bound += partition_room * scale
+        i = min(bisect_left(prefix, bound), len(prefix) - 1)
+        if bound - (prefix[i - 1] if i else 0) < prefix[i] - bound:
+            i -= 1
+        # No word sorts before '', so it splits off an empty range
+        splits.append(rest[i][0] if i >= 0 else '')
+    return Partitioner(reducers, splits, hot)
+
+def merge_salted(partitioner, paths, out, separator='\t'):
+    """Copy reducer outputs to `out`, adding up the partial counts of hot words."""
+    partials = Counter()
+    for path in paths:
+        with open(path, encoding='utf-8', errors='surrogateescape') as f:
+            for line in f:
+                word, _, count = line.rstrip('\n').partition(separator)
+                if word in partitioner.hot:
+                    partials[word] += int(count)
+                else:
+                    out.write(line)
+    for word, count in partials.items():
+        out.write('%s%s%d\n' % (word, separator, count))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Sampling range partitioner with hot-key salting.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sample = commands.add_parser('sample', help='sample the input and write a partition file')
+    sample.add_argument('input', help='input file')
+    sample.add_argument('-r', '--reducers', type=int, required=True, help='number of reducers')
+    sample.add_argument('-o', '--output', default='partitions.json',
+                        help='partition file to write (default: partitions.json)')
+    sample.add_argument('--samples', type=int, default=1000,
+                        help='number of sampled blocks (default: 1000)')
+    sample.add_argument('--block-size', type=int, default=64 * 1024,
+                        help='bytes per sampled block (default: 65536)')
+    sample.add_argument('--hot-fraction', type=float, default=0.5,
+                        help='share of an even reducer load that makes a word hot (default: 0.5)')
+    sample.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+
+    merge = commands.add_parser('merge', help='merge the salted partial counts of part files')
+    merge.add_argument('partitions', help='partition file used by the job')
+    merge.add_argument('parts', nargs='+', help='reducer output files')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.command == 'sample':
+        sample = sample_words(args.input, args.samples, args.block_size, args.seed)
+        partitioner = build_partitioner(sample, args.reducers, args.hot_fraction)
+        partitioner.save(args.output)
+        print(f"Sampled {sum(sample.values())} words, {len(sample)} distinct, "
+              f"{len(partitioner.hot)} hot", file=sys.stderr)
+    else:
+        merge_salted(Partitioner.load(args.partitions), args.parts, sys.stdout)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Fit a runtime model to results.csv and predict unmeasured configurations.
+
+Runs are grouped into engine families by the confId without a trailing
+_strong, _weak or core count (seq_strong and seq_weak are the family seq,
+local_sharded_4 is local_sharded), and each family is fitted by least
+squares to
+
+    time = t0 + a * size + b * size / cores
+
+t0 is the fixed startup cost, a the per-GB cost that does not shrink with
+more cores and b the per-GB cost that is spread over them. Coefficients come
+with 95% confidence intervals, predictions with 95% prediction intervals for
+a single run.
+
+Single-process engines (--single-process, seq by default) run on one core
+whatever nCores says, which for seq is the size of the node it ran on. They
+are fitted as time = t0 + c * size, and their predictions do not depend on
+the core count.
+
+If all runs of another family used the same core count, a and b cannot be
+told apart. The family is then also fitted as time = t0 + c * size, and a
+prediction for other core counts covers both extremes: all of c serial
+(more cores do not help) and all of c parallel (time shrinks with the core
+ratio).
+
+    predict-runtime.py -q 50G:32 -q 50G:64 -f hadoop
+"""
+
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+SIZE_UNITS = {'K': 1024 ** -2, 'M': 1024 ** -1, 'G': 1, 'T': 1024}
+CONFIDENCE = 0.95
+
+def parse_size(text):
+    """Size label like 1G, 500M or 2T in GB; a bare number is taken as GB."""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?)B?\s*', text.upper())
+    if not match:
+        raise ValueError(f"invalid size '{text}'")
+    return float(match[1]) * SIZE_UNITS[match[2] or 'G']
+
+def parse_query(text):
+    size, sep, cores = text.partition(':')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected SIZE:CORES, got '{text}'")
+    try:
+        return size.strip(), parse_size(size), int(cores)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
+def load_results(path):
+    df = pd.read_csv(path, skipinitialspace=True)
+    df['time'] = pd.to_numeric(df['time'], errors='coerce')
+    df = df.dropna(subset=['time'])
+    df['family'] = df['confId'].str.replace(r'_(strong|weak|\d+)$', '', regex=True)
+    df['size'] = df['dataSize'].map(parse_size)
+    return df
+
+class RuntimeModel:
+    """Least-squares fit of time = t0 + a * size + b * size / cores.
+
+    With single_process, the fit is time = t0 + c * size for any core count.
+    """
+
+    def __init__(self, family, df, single_process=False):
+        self.family = family
+        self.runs = len(df)
+        self.cores = sorted(df['nCores'].unique())
+        self.single_process = single_process
+        self.scaling = len(self.cores) > 1 and not single_process
+        self.names = ['t0', 'a', 'b'] if self.scaling else ['t0', 'c']
+        X = self._design(df['size'].to_numpy(float), df['nCores'].to_numpy(float))
+        y = df['time'].to_numpy(float)
+        if np.linalg.matrix_rank(X) < X.shape[1]:
+            raise ValueError(f'{family}: runs need at least {X.shape[1]} distinct '
+                             'size/core configurations')
+        self.coef, _, _, _ = np.linalg.lstsq(X, y, rcond=None)
+        self.dof = len(y) - X.shape[1]
+        if self.dof < 1:
+            raise ValueError(f'{family}: {len(y)} runs are too few to estimate the error')
+        residuals = y - X @ self.coef
+        self.sigma2 = residuals @ residuals / self.dof
+        self.cov = self.sigma2 * np.linalg.inv(X.T @ X)
+        self.t = stats.t.ppf((1 + CONFIDENCE) / 2, self.dof)
+
+    def _design(self, size, cores):
+        columns = [np.ones_like(size), size]
+        if self.scaling:
+            columns.append(size / cores)
+        return np.column_stack(columns)
+
+    def coefficients(self):
+        """(name, estimate, low, high) of each coefficient."""
+        half = self.t * np.sqrt(np.diag(self.cov))
+        return list(zip(self.names, self.coef, self.coef - half, self.coef + half))
+
+    def _interval(self, x):
+        estimate = x @ self.coef
+        half = self.t * np.sqrt(self.sigma2 + x @ self.cov @ x)
+        return estimate, estimate - half, estimate + half
+
+    def predict(self, size, cores):
+        """(estimate, low, high) for one run of `size` GB on `cores` cores."""
+        if self.scaling or self.single_process or cores in self.cores:
+            return self._interval(self._design(np.array([size]), np.array([cores]))[0])
+        serial = self._interval(np.array([1, size]))
+        # all of c parallel: the measured per-GB cost shrinks by the core ratio
+        ratio = self.cores[0] / cores
+        parallel = self._interval(np.array([1, size * ratio]))
+        return ((serial[0] + parallel[0]) / 2, min(serial[1], parallel[1]),
+                max(serial[2], parallel[2]))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fit and query a runtime model of results.csv.')
+    parser.add_argument('-r', '--results', default='results.csv',
+                        help='benchmark results (default: results.csv)')
+    parser.add_argument('-q', '--query', type=parse_query, action='append', default=[],
+                        metavar='SIZE:CORES', help='configuration to predict, e.g. 50G:32')
+    parser.add_argument('-f', '--families',
+                        help='comma-separated engine families to fit (default: all)')
+    parser.add_argument('--single-process', default='seq,local_seq',
+                        help='comma-separated families that use one core whatever their nCores '
+                             '(default: seq,local_seq)')
+    args = parser.parse_args()
+    args.single_process = set(args.single_process.split(','))
+    return args
+
+if __name__ == '__main__':
+    args = parse_args()
+    df = load_results(args.results)
+    families = args.families.split(',') if args.families else sorted(df['family'].unique())
+
+    models = [RuntimeModel(family, df[df['family'] == family], family in args.single_process)
+              for family in families]
+    print(f"Coefficients ({CONFIDENCE:.0%} confidence, t0 in s, others in s/GB):")
+    for model in models:
+        cores = ','.join(map(str, model.cores))
+        print(f"{model.family}: {model.runs} runs on {cores} cores, "
+              f"residual sd {np.sqrt(model.sigma2):.3f} s")
+        for name, estimate, low, high in model.coefficients():
+            print(f"  {name:>2} = {estimate:10.4f}  [{low:10.4f}, {high:10.4f}]")
+        if model.single_process:
+            print('  single process: time does not depend on cores')
+        elif not model.scaling:
+            print('  scaling with cores not identifiable: c = a + b / cores')
+
+    if args.query:
+        print(f"\nPredictions ({CONFIDENCE:.0%} prediction interval, seconds):")
+        for model in models:
+            for label, size, cores in args.query:
+                estimate, low, high = model.predict(size, cores)
+                note = '' if model.scaling or model.single_process or cores in model.cores \
+                    else '  (serial..parallel bounds)'
+                print(f"{model.family} {label} on {cores} cores: "
+                      f"{estimate:.1f} [{low:.1f}, {high:.1f}]{note}")
@@ -1,17 +1,43 @@
 #!/usr/bin/env python
 """A more advanced Reducer, using Python iterators and generators."""
 
-from itertools import groupby
+from itertools import groupby, islice
 from operator import itemgetter
+import argparse
 import sys
+import tempfile
 
-def read_mapper_output(file, separator='\t'):
-    for line in file:
-        yield line.rstrip().split(separator, 1)
+def read_mapper_output(file, separator='\t', reporter=None):
+    if reporter is None:
+        for line in file:
+            yield line.rstrip().split(separator, 1)
+        return
+    from counters import line_bytes
 
-def main(separator='\t'):
-    # input comes from STDIN (standard input)
-    data = read_mapper_output(sys.stdin, separator=separator)
+    # count a batch of lines at a time, so the counters cost little per line
+    while True:
+        reporter.phase('read')
+        lines = list(islice(file, reporter.batch))
+        if not lines:
+            return
+        reporter.incr('Records read', len(lines))
+        reporter.incr('Bytes read', line_bytes(''.join(lines)))
+        if reporter.timings is None:
+            # split one line at a time, which is cheaper than holding a batch
+            for line in lines:
+                yield line.rstrip().split(separator, 1)
+            continue
+        batch = [line.rstrip().split(separator, 1) for line in lines]
+        reporter.phase('aggregate')
+        yield from batch
+
+def strip_partition(data, separator='\t'):
+    # records of a partitioned job are ["<label>", "<word>\t<count>"]
+    for record in data:
+        if len(record) == 2:
+            yield record[1].split(separator, 1)
+
+def group_sorted(data, reporter=None):
     # groupby groups multiple word-count pairs by word,
     # and creates an iterator that returns consecutive keys and their group:
     #   current_word - string containing a word (the key)
@@ -19,10 +45,156 @@ def main(separator='\t'):
     for current_word, group in groupby(data, itemgetter(0)):
         try:
             total_count = sum(int(count) for current_word, count in group)
-            print("%s%s%d" % (current_word, separator, total_count))
+            yield current_word, total_count
         except ValueError:
-            # count was not a number, so silently discard this item
-            pass
+            # count was not a number, so discard this item
+            if reporter is not None:
+                reporter.incr('Malformed groups discarded')
+
+def _encode(word):
+    return word.encode('utf-8', errors='surrogateescape')
+
+def _spill_counts(counts, directory, separator):
+    import extsort
+
+    lines = [b'%s%s%d\n' % (_encode(word), separator, count)
+             for word, count in counts.items()]
+    return extsort.spill_run(lines, directory,
+                             key=lambda line: extsort.record_key(line, separator))
+
+def hash_aggregate(data, max_entries, tmp_dir=None, separator='\t', reporter=None):
+    """Sum the counts of unsorted word-count pairs in a hash table.
+
+    Whenever the table holds more than max_entries words, its partial sums are
+    spilled to a sorted run file and the table is cleared. At the end the runs
+    are k-way merged, a bounded number at a time, and summed, so memory stays
+    bounded by max_entries.
+    """
+    # the extsort module only has to be shipped with jobs that use --hash
+    import extsort
+
+    counts = {}
+    runs = []
+    sep = _encode(separator)
+    with tempfile.TemporaryDirectory(prefix='reducer-', dir=tmp_dir) as work_dir:
+        for record in data:
+            try:
+                word, count = record
+                counts[word] = counts.get(word, 0) + int(count)
+            except ValueError:
+                # missing or non-numeric count, so discard this item
+                if reporter is not None:
+                    reporter.incr('Malformed records discarded')
+                continue
+            if len(counts) > max_entries:
+                if reporter is not None:
+                    reporter.incr('Spilled runs')
+                runs.append(_spill_counts(counts, work_dir, sep))
+                counts = {}
+        if not runs:
+            yield from counts.items()
+            return
+        runs.append(_spill_counts(counts, work_dir, sep))
+        key = lambda line: extsort.record_key(line, sep)
+        runs = extsort.premerge_runs(runs, work_dir, key=key)
+        merged = extsort.merge_runs(runs, key=key)
+        for word, total_count in extsort.sum_sorted_counts(merged, sep):
+            yield word.decode('utf-8', errors='surrogateescape'), total_count
+
+def merge_sketches(data):
+    """Merge the Count-Min sketch records of all mappers by element-wise addition."""
+    # NumPy is only needed by this mode
+    from countmin import SketchCounter
+
+    merged = None
+    for record in data:
+        try:
+            _, value = record
+            counter = SketchCounter.from_record(value)
+        except ValueError:
+            # not a sketch record, so silently discard this item
+            continue
+        if merged is None:
+            merged = counter
+        else:
+            merged.merge(counter)
+    return merged
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Word count reducer.')
+    parser.add_argument('--hash', action='store_true',
+                        help='aggregate in a hash table, so the input need not be sorted')
+    parser.add_argument('--max-entries', type=int, default=1000000,
+                        help='words kept in memory before spilling in --hash mode (default: 1000000)')
+    parser.add_argument('--tmp-dir', help='directory for spilled runs (default: system temp)')
+    parser.add_argument('--partitioned', action='store_true',
+                        help='drop the partition label of mapper-adv.py --partitions records')
+    parser.add_argument('--sketch', action='store_true',
+                        help='merge Count-Min sketch records from mapper-adv.py --sketch '
+                             'and print the estimated top words (needs NumPy)')
+    parser.add_argument('--save-sketch', metavar='PATH',
+                        help='in --sketch mode, also write the merged sketch record to PATH')
+    parser.add_argument('--counters', action='store_true',
+                        help='report Hadoop streaming counters and status on stderr')
+    parser.add_argument('--timing', action='store_true',
+                        help='with --counters, also report the time spent reading, '
+                             'aggregating and writing')
+    parser.add_argument('--report-interval', type=float, default=10.0,
+                        help='seconds between counter reports (default: 10)')
+    return parser.parse_args()
+
+def emit(totals, separator, reporter=None):
+    if reporter is None:
+        for current_word, total_count in totals:
+            print("%s%s%d" % (current_word, separator, total_count))
+        return
+    while True:
+        reporter.phase('aggregate')
+        batch = list(islice(totals, reporter.batch))
+        if not batch:
+            break
+        reporter.phase('write')
+        for current_word, total_count in batch:
+            print("%s%s%d" % (current_word, separator, total_count))
+        reporter.incr('Groups reduced', len(batch))
+    reporter.close()
+
+def main(separator='\t'):
+    args = parse_args()
+    reporter = None
+    if args.counters:
+        # the counters module only has to be shipped with jobs that use it
+        from counters import Reporter
+
+        reporter = Reporter('Reducer', 'Records read', args.report_interval, args.timing)
+    # input comes from STDIN (standard input)
+    data = read_mapper_output(sys.stdin, separator=separator, reporter=reporter)
+    if args.partitioned:
+        data = strip_partition(data, separator)
+    if args.sketch:
+        merged = merge_sketches(data)
+        if merged is None:
+            return
+        if args.save_sketch:
+            with open(args.save_sketch, 'w') as f:
+                f.write(merged.to_record())
+        sketch = merged.sketch
+        summary = ("Count-Min: %d tokens, %dx%d counters, error <= %.1f with probability %.4f"
+                   % (sketch.total, sketch.depth, sketch.width, sketch.error_bound,
+                      1 - sketch.delta))
+        top = ((key.decode('utf-8', errors='surrogateescape'), estimate)
+               for key, estimate in merged.top())
+        emit(top, separator, reporter)
+        if reporter is None:
+            print(summary, file=sys.stderr)
+        else:
+            reporter.status(summary)
+        return
+    if args.hash:
+        totals = hash_aggregate(data, args.max_entries, args.tmp_dir, separator, reporter)
+    else:
+        totals = group_sorted(data, reporter)
+    emit(totals, separator, reporter)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+"""Reducer adding up the partial counts of mapper-stats.py."""
+
+from itertools import groupby
+from operator import itemgetter
+import sys
+
+def read_mapper_output(file, separator='\t'):
+    for line in file:
+        # records are "<aggregate>\t<item>\t<count>"; items never contain tabs
+        fields = line.rstrip('\n').split(separator, 2)
+        if len(fields) != 3:
+            # a field is missing, so discard this line
+            continue
+        aggregate, item, count = fields
+        yield (aggregate, item), count
+
+def main(separator='\t'):
+    data = read_mapper_output(sys.stdin, separator)
+    # the input is sorted on the two key fields, so each group holds
+    # all partial counts of one item
+    for (aggregate, item), group in groupby(data, itemgetter(0)):
+        try:
+            total_count = sum(int(count) for _, count in group)
+        except ValueError:
+            # count was not a number, so discard this item
+            continue
+        print(separator.join([aggregate, item, str(total_count)]))
+
+if __name__ == "__main__":
+    main()
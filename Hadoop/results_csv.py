@@ -0,0 +1,21 @@
+"""The results.csv table shared by the benchmark scripts."""
+
+import csv
+import os
+
+FIELDS = ['nCores', 'confId', 'dataSize', 'time']
+
+def open_results(path):
+    """Open the results CSV for appending, writing the header if it is new."""
+    exists = os.path.exists(path) and os.path.getsize(path) > 0
+    if exists:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            missing_newline = f.read(1) != b'\n'
+    f = open(path, 'a', newline='')
+    writer = csv.DictWriter(f, fieldnames=FIELDS, lineterminator='\n')
+    if not exists:
+        writer.writeheader()
+    elif missing_newline:
+        f.write('\n')
+    return f, writer
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark the word count engines and append the timings to results.csv.
+
+Each engine runs on each input, for each core count and repetition. Rows are
+appended as nCores,confId,dataSize,time as soon as a run finishes, so
+plot-results.py can read a partial benchmark too. plot-results.py averages
+per confId, so the confId of a multi-core engine carries its core count
+(local_sharded_4). Times are the engines' own 'Elapsed time' reports, like
+the sequential rows already in results.csv.
+"""
+
+from pathlib import Path
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+from results_csv import open_results
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+ELAPSED_PATTERN = re.compile(r'^Elapsed time: ([\d.]+) seconds$', re.MULTILINE)
+
+def sequential_command(path, cores, work_dir):
+    return [sys.executable, str(SCRIPT_DIR / 'sequential.py'), path]
+
+def sharded_command(path, cores, work_dir):
+    return [sys.executable, str(SCRIPT_DIR / 'sequential.py'), path, '--workers', str(cores)]
+
+def local_mr_command(path, cores, work_dir):
+    output = tempfile.mkdtemp(dir=work_dir)
+    os.rmdir(output)
+    return [sys.executable, str(SCRIPT_DIR / 'local-runner.py'), path, output,
+            '--maps', str(cores), '--reducers', str(cores), '--tmp-dir', work_dir]
+
+# engine -> (command builder, whether the engine uses more than one core)
+ENGINES = {
+    'local_seq': (sequential_command, False),
+    'local_sharded': (sharded_command, True),
+    'local_mr': (local_mr_command, True),
+}
+
+def run_once(command):
+    """Run an engine, discarding its output, and return its reported time."""
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            text=True, check=True)
+    return float(ELAPSED_PATTERN.findall(result.stderr)[-1])
+
+def parse_input(text):
+    label, sep, path = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected LABEL=PATH, got '{text}'")
+    return label, path
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the word count engines.')
+    parser.add_argument('-i', '--input', type=parse_input, action='append', required=True,
+                        metavar='LABEL=PATH',
+                        help='input file with its dataSize label, e.g. 1G=data/1G.txt '
+                             '(plot-results.py expects the labels 1G, 5G and 10G)')
+    parser.add_argument('-e', '--engines', default=','.join(ENGINES),
+                        help=f"comma-separated engines (default: {','.join(ENGINES)})")
+    parser.add_argument('-c', '--cores', default='1,2,4,8',
+                        help='comma-separated core counts (default: 1,2,4,8)')
+    parser.add_argument('-n', '--repeat', type=int, default=2,
+                        help='repetitions of each configuration (default: 2)')
+    parser.add_argument('-o', '--results', default='results.csv',
+                        help='CSV file to append to (default: results.csv)')
+    parser.add_argument('--tmp-dir', help='directory for engine outputs (default: system temp)')
+    args = parser.parse_args()
+    args.engines = args.engines.split(',')
+    for engine in args.engines:
+        if engine not in ENGINES:
+            parser.error(f"unknown engine '{engine}'")
+    args.cores = [int(cores) for cores in args.cores.split(',')]
+    return args
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    f, writer = open_results(args.results)
+    with f, tempfile.TemporaryDirectory(prefix='benchmark-', dir=args.tmp_dir) as work_dir:
+        for label, path in args.input:
+            for engine in args.engines:
+                build_command, parallel = ENGINES[engine]
+                for cores in args.cores if parallel else [1]:
+                    conf_id = f'{engine}_{cores}' if parallel else engine
+                    for run in range(1, args.repeat + 1):
+                        elapsed = run_once(build_command(path, cores, work_dir))
+                        writer.writerow({'nCores': cores, 'confId': conf_id,
+                                         'dataSize': label, 'time': elapsed})
+                        f.flush()
+                        print(f"{conf_id} {label}, run {run}: {elapsed:.6f} s", file=sys.stderr)
@@ -1,9 +1,38 @@
 #!/usr/bin/env python3
 
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, reduce
+from itertools import islice
+import argparse
+import io
+import mmap
+import os
 import sys
+import tempfile
 import time
 
+from aggregates import TextStats, parse_aggregates
+from heavy_hitters import SpaceSaving
+import checkpoint
+import compression
+import extsort
+
+BLOCK_SIZE = 16 * 1024 * 1024
+# Blocks of the bytes engine: slicing the mmap copies the block, and its
+# split() builds every token at once, so large blocks dominate peak memory
+BYTES_BLOCK_SIZE = 1024 * 1024
+MIN_BLOCK_SIZE = 4096
+# Estimated bytes per word in the external engine's table besides the key's
+# own bytes: the bytes object header, the dict slot and the count, plus the
+# line and sort key it briefly takes while the table is spilled
+ENTRY_OVERHEAD = 160
+# Estimated bytes per line buffered by the count-order sort, with its sort key
+RECORD_OVERHEAD = 200
+# Estimated bytes held per byte of a block while it is counted: the block
+# itself and its list of token objects
+BLOCK_OVERHEAD = 8
+
 def word_count(filename):
     word_counter = Counter()
     with open(filename, 'r', encoding='utf-8', errors='ignore') as f:
@@ -11,15 +40,455 @@ def word_count(filename):
             word_counter.update(line.strip().split())
     return word_counter
 
+def split_ranges(filename, n, start=0, end=None):
+    """Split [start, end) of the file into at most n newline-aligned byte ranges.
+
+    start must itself be a line start; end defaults to the end of the file.
+    """
+    if end is None:
+        end = os.path.getsize(filename)
+    bounds = [start]
+    with open(filename, 'rb') as f:
+        for i in range(1, n):
+            # Start from the byte before the cut so a cut that already sits on
+            # a line start is kept instead of skipping a whole line
+            f.seek(max(start + i * (end - start) // n - 1, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), end))
+    bounds.append(end)
+    return [(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if lo < hi]
+
+def count_range(filename, start, end):
+    """Count words in the byte range [start, end) of the file."""
+    word_counter = Counter()
+    # Blocks are cut on newlines, and UTF-8 never uses b'\n' inside a
+    # multi-byte sequence, so decoding a block at a time is lossless
+    for block in iter_blocks(filename, start, end):
+        word_counter.update(block.decode('utf-8', errors='ignore').split())
+    return word_counter
+
+def iter_blocks(filename, start, end, block_size=BLOCK_SIZE):
+    """Yield newline-aligned blocks of about block_size bytes from [start, end)."""
+    if start >= end:
+        return
+    with open(filename, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start
+        while pos < end:
+            cut = mm.find(b'\n', min(pos + block_size, end) - 1, end)
+            cut = end if cut < 0 else cut + 1
+            yield mm[pos:cut]
+            pos = cut
+
+def split_block(block, block_size):
+    """Yield newline-aligned slices of about block_size bytes of a block."""
+    pos = 0
+    while len(block) - pos > block_size:
+        cut = block.find(b'\n', pos + block_size - 1) + 1
+        if not cut:
+            break
+        yield block[pos:cut]
+        pos = cut
+    if pos < len(block):
+        yield block[pos:]
+
+def read_chunks(filename, size):
+    with open(filename, 'rb') as f:
+        yield from iter(partial(f.read, size), b'')
+
+def input_blocks(filename, block_size=BLOCK_SIZE):
+    """Yield newline-aligned blocks of the whole input, decompressing it if needed.
+
+    Plain files are read rather than memory-mapped, so the pages already
+    counted do not stay resident.
+    """
+    fmt = compression.detect_file_format(filename)
+    if fmt is None:
+        chunks = read_chunks(filename, block_size)
+    else:
+        chunks = compression.prefetch(compression.iter_members(filename, fmt))
+    pending = b''
+    for chunk in chunks:
+        cut = chunk.rfind(b'\n') + 1
+        if cut:
+            yield from split_block(pending + chunk[:cut], block_size)
+            pending = chunk[cut:]
+        else:
+            pending += chunk
+    if pending:
+        yield pending
+
+def count_range_bytes(filename, start, end):
+    """Count raw byte tokens in [start, end) of a memory-mapped file.
+
+    Blocks are cut on newlines and tokenized with bytes.split(), so nothing is
+    decoded here; use decode_counter() on the (merged) result.
+    """
+    raw_counter = Counter()
+    for block in iter_blocks(filename, start, end, BYTES_BLOCK_SIZE):
+        raw_counter.update(block.split())
+    return raw_counter
+
+def decode_counter(raw_counter):
+    """Decode the distinct byte keys into a Counter of words.
+
+    Keys are decoded like the text engine does and split again, because
+    str.split() also breaks on non-ASCII whitespace (e.g. U+00A0) and on
+    \\x1c-\\x1f, which bytes.split() keeps inside tokens. Keys that decode to
+    the same word are summed, so the counts match word_count() exactly.
+    """
+    word_counter = Counter()
+    for raw, count in raw_counter.items():
+        for word in raw.decode('utf-8', errors='ignore').split():
+            word_counter[word] += count
+    return word_counter
+
+def word_count_bytes(filename):
+    return decode_counter(count_range_bytes(filename, 0, os.path.getsize(filename)))
+
+def word_count_approx(filename, capacity):
+    """Stream the file through a Space-Saving summary of `capacity` counters.
+
+    Memory is bounded by the capacity plus one block's pre-aggregated tokens,
+    whatever the vocabulary size. Returns the summary, keyed by words.
+    """
+    raw_summary = SpaceSaving(capacity)
+    for block in input_blocks(filename):
+        raw_summary.update_counts(Counter(block.split()))
+    # Decode like decode_counter(); counts and errors of keys that decode to
+    # the same word add up, which keeps both bounds valid
+    summary = SpaceSaving(capacity)
+    summary.total = raw_summary.total
+    for raw, count in raw_summary.counts.items():
+        for word in raw.decode('utf-8', errors='ignore').split():
+            summary.counts[word] = summary.counts.get(word, 0) + count
+            summary.errors[word] = summary.errors.get(word, 0) + raw_summary.errors[raw]
+    return summary
+
+def word_count_sketch(filename, k, epsilon, delta, conservative=False):
+    """Count into a Count-Min sketch, keeping only the likely top-k keys.
+
+    Returns a countmin.SketchCounter keyed by raw bytes.
+    """
+    # NumPy is only needed by this backend
+    from countmin import CountMinSketch, SketchCounter
+
+    counter = SketchCounter(CountMinSketch.from_error(epsilon, delta,
+                                                      conservative=conservative), k)
+    for block in input_blocks(filename):
+        counter.update(Counter(block.split()))
+    return counter
+
+def _spill_table(table, directory):
+    """Write the table as a run sorted by decoded word, emptying the table.
+
+    Keys that decode to the same word become separate lines of the run;
+    their counts are summed when the runs are merged.
+    """
+    lines = []
+    while table:
+        raw, count = table.popitem()
+        for word in raw.decode('utf-8', errors='ignore').split():
+            lines.append(b'%s\t%d\n' % (word.encode('utf-8'), count))
+    return extsort.spill_run(lines, directory)
+
+def _merge_counts(runs, directory):
+    """Merge runs into one, summing the counts of equal words."""
+    totals = extsort.sum_sorted_counts(extsort.merge_runs(runs))
+    path = extsort.spill_run((b'%s\t%d\n' % total for total in totals), directory, key=None)
+    for run in runs:
+        os.remove(run)
+    return path
+
+def word_count_external(filename, memory_budget, tmp_dir=None):
+    """Count words within a memory budget, yielding (word, count) by count.
+
+    The input is read in blocks of a 64th of the budget, and counts live in
+    a Counter of byte keys. Before a block is counted, the table is spilled
+    as a sorted run if the block's tokens, were they all new words, could
+    take it over the rest of the budget. The runs are merged and summed, a
+    few at a time so their read buffers fit too, then put in count order by
+    an external sort, so memory stays flat whatever the vocabulary size.
+    Counts match word_count(); words with equal counts are ordered by their
+    bytes instead of by first occurrence.
+    """
+    block_size = min(BLOCK_SIZE, max(MIN_BLOCK_SIZE, memory_budget // 64))
+    table_budget = memory_budget - block_size * BLOCK_OVERHEAD
+    # Every open run holds a read buffer and a file descriptor during the merge
+    fan_in = max(2, min(memory_budget // (2 * io.DEFAULT_BUFFER_SIZE),
+                        extsort.merge_factor()))
+    with tempfile.TemporaryDirectory(prefix='sequential-', dir=tmp_dir) as work_dir:
+        runs = []
+        table = Counter()
+        used = 0
+        for block in input_blocks(filename, block_size):
+            tokens = block.split()
+            if not tokens:
+                continue
+            entry_size = ENTRY_OVERHEAD + len(block) // len(tokens)
+            if table and used + len(tokens) * entry_size > table_budget:
+                runs.append(_spill_table(table, work_dir))
+                used = 0
+            before = len(table)
+            table.update(tokens)
+            used += (len(table) - before) * entry_size
+            del tokens
+        runs.append(_spill_table(table, work_dir))
+        del table
+
+        while len(runs) > fan_in:
+            runs = [_merge_counts(runs[i:i + fan_in], work_dir)
+                    for i in range(0, len(runs), fan_in)]
+        totals = extsort.sum_sorted_counts(extsort.merge_runs(runs))
+        lines = (b'%s\t%d\n' % (word, total) for word, total in totals)
+        max_records = max(1, memory_budget // RECORD_OVERHEAD)
+        for line in extsort.sort_by_count(lines, max_records, work_dir):
+            word, count = line.rstrip(b'\n').split(b'\t')
+            yield word.decode('utf-8'), int(count)
+
+def stats_range(filename, start, end, aggregates, n):
+    stats = TextStats(aggregates, n)
+    for block in iter_blocks(filename, start, end):
+        stats.update(block.decode('utf-8', errors='ignore'), filename)
+    return stats
+
+def word_count_stats(filename, aggregates, n=2, workers=1):
+    """Compute the selected aggregates (see aggregates.py) in one scan."""
+    if workers > 1 and compression.detect_file_format(filename) is None:
+        ranges = split_ranges(filename, workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(stats_range, [filename] * len(ranges),
+                             [start for start, _ in ranges], [end for _, end in ranges],
+                             [aggregates] * len(ranges), [n] * len(ranges))
+            return reduce(TextStats.merge, parts, TextStats(aggregates, n))
+    stats = TextStats(aggregates, n)
+    for block in input_blocks(filename):
+        stats.update(block.decode('utf-8', errors='ignore'), filename)
+    return stats
+
+def count_chunks(chunks):
+    """Count raw tokens in a stream of byte chunks cut at arbitrary points.
+
+    Returns (head, raw_counter, tail): the bytes before the first and after the
+    last newline, which may continue lines of the neighbouring ranges, and the
+    counts of everything in between. Without any newline, tail is None and
+    head holds all the bytes.
+    """
+    raw_counter = Counter()
+    head = None
+    pending = b''
+    for chunk in chunks:
+        cut = chunk.rfind(b'\n') + 1
+        if not cut:
+            pending += chunk
+            continue
+        block = pending + chunk[:cut]
+        pending = chunk[cut:]
+        if head is None:
+            first = block.find(b'\n') + 1
+            head, block = block[:first], block[first:]
+        raw_counter.update(block.split())
+    if head is None:
+        return pending, raw_counter, None
+    return head, raw_counter, pending
+
+def count_compressed_range(filename, fmt, start, end):
+    """count_chunks() over the members that start in [start, end) of the file."""
+    return count_chunks(compression.prefetch(compression.iter_members(filename, fmt, start, end)))
+
+def word_count_compressed(filename, fmt, workers=1):
+    """Count words in a gzip or bzip2 file.
+
+    Files made of many small members are split into byte ranges decoded by
+    separate processes; any other file is decoded in order by a prefetching
+    background thread. Lines cut at range boundaries are stitched back
+    together before being counted.
+    """
+    if workers > 1 and compression.is_splittable(filename, fmt):
+        size = os.path.getsize(filename)
+        bounds = [i * size // workers for i in range(workers + 1)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(count_compressed_range, [filename] * workers,
+                                  [fmt] * workers, bounds[:-1], bounds[1:]))
+    else:
+        parts = [count_compressed_range(filename, fmt, 0, None)]
+
+    # Merge in order, so the insertion order matches an uncompressed run
+    raw_counter = Counter()
+    pending = b''
+    for head, part_counter, tail in parts:
+        if tail is None:
+            pending += head
+            continue
+        raw_counter.update((pending + head).split())
+        raw_counter.update(part_counter)
+        pending = tail
+    raw_counter.update(pending.split())
+    return decode_counter(raw_counter)
+
+ENGINES = {
+    'text': count_range,
+    'bytes': count_range_bytes,
+}
+
+def _merge_pair(left, right):
+    left.update(right)
+    return left
+
+def word_count_sharded(filename, workers, engine='text', start=0, end=None):
+    """Count words with one process per shard and merge with a tree reduction.
+
+    Adjacent counters are always merged left-to-right, so the insertion order
+    (and therefore the most_common() tie order) matches the single-process run.
+    """
+    ranges = split_ranges(filename, workers, start, end)
+    if not ranges:
+        return Counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        counters = list(pool.map(ENGINES[engine], [filename] * len(ranges),
+                                 [lo for lo, _ in ranges],
+                                 [hi for _, hi in ranges]))
+        while len(counters) > 1:
+            merged = list(pool.map(_merge_pair, counters[0::2], counters[1::2]))
+            if len(counters) % 2:
+                merged.append(counters[-1])
+            counters = merged
+    if engine == 'bytes':
+        return decode_counter(counters[0])
+    return counters[0]
+
+def count_span(filename, start, end, workers=1, engine='text'):
+    """Count the words of the newline-aligned range [start, end)."""
+    if workers > 1:
+        return word_count_sharded(filename, workers, engine, start, end)
+    if engine == 'bytes':
+        return decode_counter(count_range_bytes(filename, start, end))
+    return count_range(filename, start, end)
+
+def word_count_incremental(filename, checkpoint_path, workers=1, engine='text'):
+    """Count words, resuming from and updating a checkpoint of an earlier run.
+
+    Only the bytes appended since the checkpoint are counted. If the file no
+    longer starts with the checkpointed content, it is recounted from byte 0.
+    A trailing line without a newline may still be growing, so it is counted
+    for this run's result but left out of the saved state.
+    """
+    size = os.path.getsize(filename)
+    state = checkpoint.load(checkpoint_path)
+    if state is not None and checkpoint.matches(filename, state):
+        word_counter, start = state.counter, state.offset
+        print(f"Checkpoint: resuming at byte {start}", file=sys.stderr)
+    else:
+        word_counter, start = Counter(), 0
+        if state is not None:
+            print("Checkpoint: input was rewritten, recounting from byte 0", file=sys.stderr)
+
+    end = checkpoint.last_line_end(filename, start, size)
+    word_counter.update(count_span(filename, start, end, workers, engine))
+    checkpoint.save(checkpoint_path, word_counter, filename, end)
+    word_counter.update(count_span(filename, end, size, 1, engine))
+    return word_counter
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Count words in a text file.')
+    parser.add_argument('input', help='input file, plain text or gzip/bzip2-compressed')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of counting processes (default: 1)')
+    parser.add_argument('-e', '--engine', choices=sorted(ENGINES), default='text',
+                        help='text: decode and split line by line (default); '
+                             'bytes: mmap and split raw blocks, decode only distinct words '
+                             '(faster on repetitive text, slower on large vocabularies)')
+    parser.add_argument('-k', '--top', type=int,
+                        help='print only the K most common words')
+    parser.add_argument('--approx', action='store_true',
+                        help='with --top, stream through a fixed-size Space-Saving summary '
+                             'and print word, count and maximum overestimate')
+    parser.add_argument('--capacity', type=int,
+                        help='counters kept by --approx (default: 10 * K)')
+    parser.add_argument('--sketch', action='store_true',
+                        help='with --top, count into a Count-Min sketch (needs NumPy)')
+    parser.add_argument('--epsilon', type=float, default=1e-5,
+                        help='sketch error as a fraction of all tokens (default: 1e-5)')
+    parser.add_argument('--delta', type=float, default=0.01,
+                        help='probability of exceeding the sketch error (default: 0.01)')
+    parser.add_argument('--conservative', action='store_true',
+                        help='use conservative update for tighter sketch estimates')
+    parser.add_argument('-m', '--memory-budget', type=float, metavar='MB',
+                        help='out-of-core mode: count in about MB megabytes besides the '
+                             'interpreter, spilling sorted runs to disk')
+    parser.add_argument('--tmp-dir', help='directory for spilled runs (default: system temp)')
+    parser.add_argument('-a', '--aggregates', metavar='LIST',
+                        help='statistics mode: compute the comma-separated aggregates '
+                             '(words, ngrams, lines, lengths, files) in one scan and print '
+                             'aggregate, item and count; --top limits words and n-grams')
+    parser.add_argument('-n', '--ngram', type=int, default=2,
+                        help='words per n-gram for the ngrams aggregate (default: 2)')
+    parser.add_argument('-c', '--checkpoint', metavar='PATH',
+                        help='incremental mode: resume from the counts saved in PATH '
+                             'and count only the bytes appended since, then update PATH')
+    args = parser.parse_args()
+    if (args.approx or args.sketch) and args.top is None:
+        parser.error('--approx and --sketch require --top')
+    if args.approx and args.sketch:
+        parser.error('--approx and --sketch are mutually exclusive')
+    if args.memory_budget and (args.approx or args.sketch or args.checkpoint or args.workers > 1):
+        parser.error('--memory-budget cannot be combined with --approx, --sketch, '
+                     '--checkpoint or --workers')
+    if args.aggregates:
+        if args.approx or args.sketch or args.memory_budget or args.checkpoint:
+            parser.error('--aggregates cannot be combined with --approx, --sketch, '
+                         '--memory-budget or --checkpoint')
+        try:
+            args.aggregates = parse_aggregates(args.aggregates)
+        except ValueError as error:
+            parser.error(str(error))
+    return args
+
+def count_words(args):
+    fmt = compression.detect_file_format(args.input)
+    if fmt is not None:
+        if args.checkpoint:
+            sys.exit('--checkpoint needs an uncompressed, appendable input')
+        return word_count_compressed(args.input, fmt, args.workers)
+    if args.checkpoint:
+        return word_count_incremental(args.input, args.checkpoint, args.workers, args.engine)
+    if args.workers > 1:
+        return word_count_sharded(args.input, args.workers, args.engine)
+    if args.engine == 'bytes':
+        return word_count_bytes(args.input)
+    return word_count(args.input)
+
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <input-file>", file=sys.stderr)
-        sys.exit(1)
+    args = parse_args()
 
     start_time = time.perf_counter()
-    result = word_count(sys.argv[1])
-    for word, count in result.most_common():
-        print(f"{word}\t{count}")
+    if args.approx:
+        summary = word_count_approx(args.input, args.capacity or 10 * args.top)
+        rows = summary.top(args.top)
+    elif args.sketch:
+        counter = word_count_sketch(args.input, args.top, args.epsilon, args.delta,
+                                    args.conservative)
+        rows = [(key.decode('utf-8', errors='ignore'), estimate)
+                for key, estimate in counter.top()]
+    elif args.aggregates:
+        stats = word_count_stats(args.input, args.aggregates, args.ngram, args.workers)
+        rows = stats.records(args.top)
+    elif args.memory_budget:
+        rows = islice(word_count_external(args.input, int(args.memory_budget * 1024 * 1024),
+                                          args.tmp_dir), args.top)
+    else:
+        # most_common(K) selects the top K with a heap instead of sorting everything
+        rows = count_words(args).most_common(args.top)
+    for row in rows:
+        print('\t'.join(map(str, row)))
     elapsed = time.perf_counter() - start_time
 
+    if args.approx:
+        print(f"Space-Saving: {summary.total} tokens, {summary.capacity} counters, "
+              f"max error {summary.max_error}", file=sys.stderr)
+    elif args.sketch:
+        sketch = counter.sketch
+        print(f"Count-Min: {sketch.total} tokens, {sketch.depth}x{sketch.width} counters, "
+              f"error <= {sketch.error_bound:.1f} with probability {1 - sketch.delta:.4f}",
+              file=sys.stderr)
     print(f"Elapsed time: {elapsed:.6f} seconds", file=sys.stderr)
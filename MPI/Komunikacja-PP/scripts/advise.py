@@ -0,0 +1,150 @@
+"""Generate a lookup table of the faster send mode per message size.
+
+For each placement (intra- and inter-node) the measured throughputs of
+standard and buffered communication are compared size by size. Consecutive
+sizes with the same winner form a range, and ranges meet halfway (on the
+log scale) between the measured sizes. Buffered mode only wins if it is
+faster by more than --margin, as it costs an extra copy and an attached
+buffer. The table is written as JSON and as a C header:
+
+    #include "send_mode.h"
+    ...
+    placement_t placement = send_mode_placement(MPI_COMM_WORLD, peer);  // collective
+    send_mode_send(buffer, size, MPI_CHAR, peer, 0, MPI_COMM_WORLD, placement);
+
+send_mode_send() uses MPI_Bsend for buffered ranges, so the program has to
+attach a buffer with MPI_Buffer_attach first, as homework.c does.
+"""
+
+from pathlib import Path
+import argparse
+import json
+import math
+
+import pandas as pd
+
+PLACEMENTS = ('intra', 'inter')
+
+def advise(data, margin):
+    """Ranges [low, high) of message sizes and their faster mode."""
+    data = data.sort_values('Size')
+    ranges = []
+    for size, standard, buffered in zip(data['Size'], data['Standard_Throughput'],
+                                        data['Buffered_Throughput']):
+        mode = 'Buffered' if buffered > standard * (1 + margin) else 'Standard'
+        if ranges and ranges[-1]['mode'] == mode:
+            ranges[-1]['last_measured'] = int(size)
+            continue
+        if ranges:
+            # switch halfway between the last size of the previous range and this one
+            low = math.ceil(math.sqrt(ranges[-1]['last_measured'] * size))
+            ranges[-1]['high'] = low
+        else:
+            low = 0
+        ranges.append({'low': low, 'high': None, 'mode': mode, 'last_measured': int(size)})
+    for entry in ranges:
+        del entry['last_measured']
+    return ranges
+
+def c_table(placement, ranges):
+    lines = [f'static const send_mode_range_t send_mode_{placement}[] = {{']
+    for entry in ranges:
+        high = 'SIZE_MAX' if entry['high'] is None else f"{entry['high']}u"
+        lines.append(f"    {{{high}, SEND_MODE_{entry['mode'].upper()}}},")
+    lines.append('};')
+    return '\n'.join(lines)
+
+def c_header(tables):
+    guard = 'SEND_MODE_H'
+    tables_code = '\n\n'.join(c_table(placement, ranges) for placement, ranges in tables.items())
+    choices = '\n'.join(
+        f'    case PLACEMENT_{placement.upper()}: table = send_mode_{placement}; break;'
+        for placement in tables)
+    return f'''/* Generated by scripts/advise.py from the measured throughputs; do not edit. */
+#ifndef {guard}
+#define {guard}
+
+#include <mpi.h>
+#include <stddef.h>
+#include <stdint.h>
+
+typedef enum {{ SEND_MODE_STANDARD, SEND_MODE_BUFFERED }} send_mode_t;
+typedef enum {{ PLACEMENT_INTRA, PLACEMENT_INTER }} placement_t;
+
+/* Messages smaller than `limit` bytes (and not in an earlier range) use `mode` */
+typedef struct {{
+    size_t limit;
+    send_mode_t mode;
+}} send_mode_range_t;
+
+{tables_code}
+
+static inline send_mode_t send_mode_choose(size_t bytes, placement_t placement) {{
+    const send_mode_range_t *table = NULL;
+    switch (placement) {{
+{choices}
+    default: return SEND_MODE_STANDARD;
+    }}
+    while (table->limit != SIZE_MAX && bytes >= table->limit) {{
+        table++;
+    }}
+    return table->mode;
+}}
+
+/* Whether `peer` of `comm` runs on the same node as the caller; collective over comm */
+static inline placement_t send_mode_placement(MPI_Comm comm, int peer) {{
+    MPI_Comm node;
+    MPI_Group group, node_group;
+    int node_peer;
+    MPI_Comm_split_type(comm, MPI_COMM_TYPE_SHARED, 0, MPI_INFO_NULL, &node);
+    MPI_Comm_group(comm, &group);
+    MPI_Comm_group(node, &node_group);
+    MPI_Group_translate_ranks(group, 1, &peer, node_group, &node_peer);
+    MPI_Group_free(&node_group);
+    MPI_Group_free(&group);
+    MPI_Comm_free(&node);
+    return node_peer == MPI_UNDEFINED ? PLACEMENT_INTER : PLACEMENT_INTRA;
+}}
+
+/* MPI_Send or MPI_Bsend, whichever was faster for this size and placement */
+static inline int send_mode_send(const void *buf, int count, MPI_Datatype type, int dest,
+                                 int tag, MPI_Comm comm, placement_t placement) {{
+    int type_size;
+    MPI_Type_size(type, &type_size);
+    if (send_mode_choose((size_t)count * type_size, placement) == SEND_MODE_BUFFERED) {{
+        return MPI_Bsend(buf, count, type, dest, tag, comm);
+    }}
+    return MPI_Send(buf, count, type, dest, tag, comm);
+}}
+
+#endif /* {guard} */
+'''
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate the faster send mode per message size.')
+    parser.add_argument('--intra', default='./out/intra_node_data.csv',
+                        help='intra-node throughputs (default: ./out/intra_node_data.csv)')
+    parser.add_argument('--inter', default='./out/inter_node_data.csv',
+                        help='inter-node throughputs (default: ./out/inter_node_data.csv)')
+    parser.add_argument('--margin', type=float, default=0.05,
+                        help='relative advantage buffered mode needs to be chosen (default: 0.05)')
+    parser.add_argument('--json', default='./out/send_mode.json',
+                        help='JSON table to write (default: ./out/send_mode.json)')
+    parser.add_argument('--header', default='./send_mode.h',
+                        help='C header to write (default: ./send_mode.h)')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    tables = {placement: advise(pd.read_csv(getattr(args, placement)), args.margin)
+              for placement in PLACEMENTS}
+    with open(args.json, 'w') as file:
+        json.dump(tables, file, indent=1)
+    Path(args.header).write_text(c_header(tables))
+
+    for placement, ranges in tables.items():
+        print(f"{placement}-node:")
+        for entry in ranges:
+            high = 'inf' if entry['high'] is None else entry['high']
+            print(f"  [{entry['low']}, {high}) bytes: {entry['mode']}")
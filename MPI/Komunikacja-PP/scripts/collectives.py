@@ -0,0 +1,339 @@
+"""Benchmark and cost model of collective algorithms on a local process group.
+
+Broadcast, reduce (sum) and allreduce of float64 vectors are implemented on
+top of point-to-point channels in shared memory, with these algorithms:
+
+    flat                the root sends to / receives from every rank in turn
+    binomial            binomial tree rooted at rank 0
+    recursive_doubling  allreduce by pairwise exchanges (power-of-two groups)
+    ring                reduce-scatter around a ring, then allgather (allreduce)
+                        or gather at the root (reduce)
+
+Each algorithm is also costed with the point-to-point time t(n) fitted to
+intra_node_data.csv by hockney.py, where n is the message size in bytes:
+
+    flat                (p - 1) t(n), twice for allreduce
+    binomial            ceil(log2 p) t(n), twice for allreduce
+    recursive_doubling  log2(p) t(n)
+    ring                2 (p - 1) t(n / p)
+
+and for every operation, group size and message size the fastest algorithm
+is reported, both measured here and predicted for the cluster.
+
+A channel is one slot in shared memory with a sent and an acknowledged
+sequence number: the sender waits until its previous message was taken, the
+receiver spins until a new one arrives. Ranks are forked processes.
+"""
+
+from itertools import product
+from multiprocessing import shared_memory
+import argparse
+import csv
+import math
+import multiprocessing
+import os
+import queue
+import struct
+import sys
+import time
+
+import numpy as np
+
+from hockney import fit_csv
+
+HEADER = struct.Struct('<QQ')
+# Spins on a sequence number before yielding the CPU to the other processes
+SPINS = 1000
+# Seconds between checks that no rank has died while waiting for results
+POLL_SECONDS = 1
+
+class Channel:
+    """Single-slot channel from one rank to another."""
+
+    def __init__(self, buf, offset, capacity):
+        self.buf = buf
+        self.offset = offset
+        self.data = np.ndarray(capacity // 8, np.float64, buf, offset + HEADER.size)
+        self.sent = 0
+        self.received = 0
+
+    def _wait(self, index, value):
+        spins = 0
+        while HEADER.unpack_from(self.buf, self.offset)[index] != value:
+            spins += 1
+            if spins == SPINS:
+                spins = 0
+                os.sched_yield()
+
+    def send(self, array):
+        self._wait(1, self.sent)  # previous message taken
+        self.data[:len(array)] = array
+        self.sent += 1
+        struct.pack_into('<Q', self.buf, self.offset, self.sent)
+
+    def _take(self, array, add):
+        self.received += 1
+        self._wait(0, self.received)
+        if add:
+            array += self.data[:len(array)]
+        else:
+            array[:] = self.data[:len(array)]
+        struct.pack_into('<Q', self.buf, self.offset + 8, self.received)
+
+    def recv_into(self, array):
+        self._take(array, add=False)
+
+    def recv_add(self, array):
+        self._take(array, add=True)
+
+class Group:
+    """This rank's view of the channels between p ranks."""
+
+    def __init__(self, buf, rank, size, capacity):
+        self.rank = rank
+        self.size = size
+        slot = HEADER.size + capacity
+        self.channels = [[Channel(buf, (src * size + dst) * slot, capacity)
+                          for dst in range(size)] for src in range(size)]
+
+    def send(self, dst, array):
+        self.channels[self.rank][dst].send(array)
+
+    def recv_into(self, src, array):
+        self.channels[src][self.rank].recv_into(array)
+
+    def recv_add(self, src, array):
+        self.channels[src][self.rank].recv_add(array)
+
+def flat_bcast(group, data):
+    if group.rank == 0:
+        for dst in range(1, group.size):
+            group.send(dst, data)
+    else:
+        group.recv_into(0, data)
+
+def flat_reduce(group, data):
+    if group.rank == 0:
+        for src in range(1, group.size):
+            group.recv_add(src, data)
+    else:
+        group.send(0, data)
+
+def binomial_bcast(group, data):
+    rank, size = group.rank, group.size
+    mask = 1
+    while mask < size:
+        if rank & mask:
+            group.recv_into(rank - mask, data)
+            break
+        mask <<= 1
+    mask >>= 1
+    while mask > 0:
+        if rank + mask < size:
+            group.send(rank + mask, data)
+        mask >>= 1
+
+def binomial_reduce(group, data):
+    rank, size = group.rank, group.size
+    mask = 1
+    while mask < size:
+        if rank & mask:
+            group.send(rank - mask, data)
+            break
+        if rank + mask < size:
+            group.recv_add(rank + mask, data)
+        mask <<= 1
+
+def recursive_doubling_allreduce(group, data):
+    mask = 1
+    while mask < group.size:
+        partner = group.rank ^ mask
+        group.send(partner, data)
+        group.recv_add(partner, data)
+        mask <<= 1
+
+def _ring_reduce_scatter(group, chunks):
+    """Afterwards rank r holds the full sum of chunk (r + 1) % p."""
+    rank, size = group.rank, group.size
+    right, left = (rank + 1) % size, (rank - 1) % size
+    for step in range(size - 1):
+        group.send(right, chunks[(rank - step) % size])
+        group.recv_add(left, chunks[(rank - step - 1) % size])
+
+def ring_allreduce(group, data):
+    rank, size = group.rank, group.size
+    chunks = np.array_split(data, size)
+    _ring_reduce_scatter(group, chunks)
+    right, left = (rank + 1) % size, (rank - 1) % size
+    for step in range(size - 1):
+        group.send(right, chunks[(rank - step + 1) % size])
+        group.recv_into(left, chunks[(rank - step) % size])
+
+def ring_reduce(group, data):
+    rank, size = group.rank, group.size
+    chunks = np.array_split(data, size)
+    _ring_reduce_scatter(group, chunks)
+    if rank == 0:
+        for src in range(1, size):
+            group.recv_into(src, chunks[(src + 1) % size])
+    else:
+        group.send(0, chunks[(rank + 1) % size])
+
+def _allreduce(reduce, bcast):
+    def allreduce(group, data):
+        reduce(group, data)
+        bcast(group, data)
+    return allreduce
+
+# operation -> algorithm -> implementation
+ALGORITHMS = {
+    'bcast': {'flat': flat_bcast, 'binomial': binomial_bcast},
+    'reduce': {'flat': flat_reduce, 'binomial': binomial_reduce, 'ring': ring_reduce},
+    'allreduce': {'flat': _allreduce(flat_reduce, flat_bcast),
+                  'binomial': _allreduce(binomial_reduce, binomial_bcast),
+                  'recursive_doubling': recursive_doubling_allreduce,
+                  'ring': ring_allreduce},
+}
+
+def supported(algorithm, procs):
+    return algorithm != 'recursive_doubling' or procs & (procs - 1) == 0
+
+def predict(cost, operation, algorithm, procs, size):
+    """Predicted time in microseconds from the point-to-point cost t(n)."""
+    log_p = math.ceil(math.log2(procs))
+    twice = 2 if operation == 'allreduce' else 1
+    if algorithm == 'flat':
+        return twice * (procs - 1) * cost(size)
+    if algorithm == 'binomial':
+        return twice * log_p * cost(size)
+    if algorithm == 'recursive_doubling':
+        return log_p * cost(size)
+    return 2 * (procs - 1) * cost(size / procs)
+
+def expected(operation, rank, procs, length):
+    """The result of an operation on the data rank + 1 at every rank, or None."""
+    if operation == 'reduce' and rank != 0:
+        return None
+    if operation == 'bcast':
+        return np.ones(length)
+    return np.full(length, procs * (procs + 1) / 2)
+
+def run_rank(buf, rank, procs, capacity, tests, reps, barrier, results):
+    group = Group(buf, rank, procs, capacity)
+    for operation, algorithm, size in tests:
+        implementation = ALGORITHMS[operation][algorithm]
+        length = size // 8
+        data = np.full(length, rank + 1.0)
+        implementation(group, data)
+        want = expected(operation, rank, procs, length)
+        if want is not None and not np.array_equal(data, want):
+            raise RuntimeError(f'{algorithm} {operation} gave a wrong result at rank {rank}')
+        barrier.wait()
+        start_time = time.perf_counter()
+        for _ in range(reps):
+            implementation(group, data)
+        barrier.wait()
+        elapsed = (time.perf_counter() - start_time) / reps
+        if rank == 0:
+            results.put((operation, algorithm, size, elapsed * 1e6))
+    if rank == 0:
+        results.put(None)
+
+def benchmark(procs, sizes, operations, reps):
+    """Measured microseconds per operation, by (operation, algorithm, size)."""
+    context = multiprocessing.get_context('fork')
+    capacity = max(sizes)
+    shm = shared_memory.SharedMemory(create=True, size=procs * procs * (HEADER.size + capacity))
+    try:
+        shm.buf[:] = bytes(len(shm.buf))
+        tests = [(operation, algorithm, size)
+                 for operation in operations for algorithm in ALGORITHMS[operation]
+                 if supported(algorithm, procs) for size in sizes]
+        barrier, results = context.Barrier(procs), context.Queue()
+        ranks = [context.Process(target=run_rank, args=(shm.buf, rank, procs, capacity, tests,
+                                                        reps, barrier, results))
+                 for rank in range(procs)]
+        for process in ranks:
+            process.start()
+        try:
+            measured = {}
+            while True:
+                try:
+                    result = results.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    # the other ranks would wait for a failed rank forever
+                    if any(process.exitcode for process in ranks):
+                        raise RuntimeError(f'a rank of the {procs}-process group failed')
+                    continue
+                if result is None:
+                    break
+                measured[result[:3]] = result[3]
+        except BaseException:
+            for process in ranks:
+                process.terminate()
+            raise
+        finally:
+            for process in ranks:
+                process.join()
+        if any(process.exitcode for process in ranks):
+            raise RuntimeError(f'a rank of the {procs}-process group failed')
+        return measured
+    finally:
+        shm.close()
+        shm.unlink()
+
+def parse_list(text):
+    return [int(value) for value in text.split(',')]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark collective algorithms locally.')
+    parser.add_argument('-p', '--procs', type=parse_list, default='2,4',
+                        help='comma-separated process counts (default: 2,4)')
+    parser.add_argument('-s', '--sizes', type=parse_list, default='8,1024,65536,1048576',
+                        help='comma-separated message sizes in bytes, multiples of 8 '
+                             '(default: 8,1024,65536,1048576)')
+    parser.add_argument('--operations', default=','.join(ALGORITHMS),
+                        help=f"comma-separated operations (default: {','.join(ALGORITHMS)})")
+    parser.add_argument('-r', '--reps', type=int, default=20,
+                        help='timed repetitions of each test (default: 20)')
+    parser.add_argument('--model', default='./out/intra_node_data.csv',
+                        help='throughputs to fit t(n) to (default: ./out/intra_node_data.csv)')
+    parser.add_argument('--mode', default='Standard', choices=['Standard', 'Buffered'],
+                        help='send mode of the fitted t(n) (default: Standard)')
+    parser.add_argument('-o', '--output', help='also write all rows to this CSV')
+    args = parser.parse_args()
+    args.operations = args.operations.split(',')
+    for operation in args.operations:
+        if operation not in ALGORITHMS:
+            parser.error(f"unknown operation '{operation}'")
+    if any(size <= 0 or size % 8 for size in args.sizes):
+        parser.error('sizes must be positive multiples of 8 bytes')
+    return args
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    cost = fit_csv(args.model, args.mode)
+    rows = []
+    for procs in args.procs:
+        measured = benchmark(procs, args.sizes, args.operations, args.reps)
+        for operation, size in product(args.operations, args.sizes):
+            candidates = [algorithm for algorithm in ALGORITHMS[operation]
+                          if (operation, algorithm, size) in measured]
+            timings = {algorithm: (measured[operation, algorithm, size],
+                                   predict(cost, operation, algorithm, procs, size))
+                       for algorithm in candidates}
+            fastest = min(timings, key=lambda algorithm: timings[algorithm][0])
+            predicted_fastest = min(timings, key=lambda algorithm: timings[algorithm][1])
+            print(f"{operation} p={procs} {size} bytes: fastest here {fastest}, "
+                  f"predicted {predicted_fastest}")
+            for algorithm, (local, model) in timings.items():
+                print(f"  {algorithm:<18} measured {local:10.1f} us  predicted {model:10.1f} us")
+                rows.append([operation, procs, size, algorithm, local, model])
+    if args.output:
+        with open(args.output, 'w', newline='') as file:
+            writer = csv.writer(file, lineterminator='\n')
+            writer.writerow(['Operation', 'Processes', 'Size', 'Algorithm',
+                             'Measured_us', 'Predicted_us'])
+            writer.writerows(rows)
+    print(f"{len(rows)} results", file=sys.stderr)
@@ -1,43 +1,166 @@
+"""Convert ping-pong logs of homework.c into tidy CSV tables.
+
+Every log may hold several runs of the program; each run starts with its
+"Delay for 1 byte" line. All samples are kept, one row per run, placement
+(intra- or inter-node), mode and message size, and summarized per size over
+all runs. The 1-byte delay of every run goes to a table of its own. Logs are
+parsed line by line, in parallel with --jobs.
+
+    python convert.py intra=./in/intra_*.txt inter=./in/inter_*.txt --wide ./out
+"""
+
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import csv
 import re
 
-# Setup the input and output file names
-input_filename = './in/raw_data.txt'
-output_filename = './out/data.csv'
+import numpy as np
 
 # Regex patterns to match lines
 delay_pattern = re.compile(r'^Delay for 1 byte: ([\d\.]+) ms$')
 throughput_pattern = re.compile(r'^(Standard|Buffered) Communication: Size (\d+) bytes, Throughput: ([\d\.]+) Mbps$')
 
-# Data structure to hold the parsed data
-data = {'Size': [], 'Standard_Throughput': [], 'Buffered_Throughput': [], 'Delay': None}
-
-# Read & Process the input file
-with open(input_filename, 'r') as file:
-    for line in file:
-        line = line.strip()
-        if delay_match := delay_pattern.match(line):
-            data['Delay'] = float(delay_match.group(1))
-        elif throughput_match := throughput_pattern.match(line):
-            comm_type = throughput_match.group(1)
-            size = int(throughput_match.group(2))
-            throughput = float(throughput_match.group(3))
-
-            if comm_type == 'Standard':
-                if size not in data['Size']:
-                    data['Size'].append(size)
-                    data['Standard_Throughput'].append(throughput)
-                    data['Buffered_Throughput'].append(None)  # Placeholder until buffered value is found
-            else:  # Buffered
-                index = data['Size'].index(size)
-                data['Buffered_Throughput'][index] = throughput
-
-# Write the processed data to CSV
-with open(output_filename, 'w') as file:
-    header = 'Size,Standard_Throughput,Buffered_Throughput\n'
-    file.write(header)
-    for size, sth, bth in zip(data['Size'], data['Standard_Throughput'], data['Buffered_Throughput']):
-        line = f'{size},{sth},{bth}\n'
-        file.write(line)
-
-# Optionally print out the delay
-print(f"Delay for 1 byte: {data['Delay']} ms")
+PLACEMENTS = ('intra', 'inter')
+MODES = ('Standard', 'Buffered')
+SAMPLE_FIELDS = ['Run', 'Placement', 'Mode', 'Size', 'Throughput', 'Time_us']
+DELAY_FIELDS = ['Run', 'Placement', 'Delay_ms']
+
+def guess_placement(path, default):
+    """intra or inter if the file name says so, else the default."""
+    name = Path(path).name.lower()
+    for placement in PLACEMENTS:
+        if placement in name:
+            return placement
+    return default
+
+def parse_log(path, placement):
+    """Samples and delays of one log.
+
+    Samples are (run, placement, mode, size, throughput) tuples, delays are
+    (run, placement, delay in ms) tuples.
+    """
+    samples = []
+    delays = []
+    run = 0
+    seen = set()
+    with open(path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if delay_match := delay_pattern.match(line):
+                run += 1
+                seen.clear()
+                delays.append((f'{Path(path).stem}#{run}', placement, float(delay_match.group(1))))
+            elif throughput_match := throughput_pattern.match(line):
+                comm_type = throughput_match.group(1)
+                size = int(throughput_match.group(2))
+                throughput = float(throughput_match.group(3))
+                # A log without delay lines still starts a new run when a
+                # size repeats
+                if run == 0 or (comm_type, size) in seen:
+                    run += 1
+                    seen.clear()
+                seen.add((comm_type, size))
+                samples.append((f'{Path(path).stem}#{run}', placement, comm_type, size, throughput))
+    return samples, delays
+
+def summarize(samples, percentiles):
+    """Per (placement, mode, size) statistics of the throughput in Mbps."""
+    groups = defaultdict(list)
+    for _, placement, mode, size, throughput in samples:
+        groups[placement, mode, size].append(throughput)
+    rows = []
+    for (placement, mode, size), values in sorted(groups.items()):
+        values = np.array(values)
+        row = {'Placement': placement, 'Mode': mode, 'Size': size, 'Runs': len(values),
+               'Min': values.min(), 'Median': np.median(values), 'Mean': values.mean(),
+               'Max': values.max()}
+        for q in percentiles:
+            row[f'P{q:g}'] = np.percentile(values, q)
+        rows.append(row)
+    return rows
+
+def write_wide(stats, directory):
+    """Median throughputs as <placement>_node_data.csv, the input of plot.py."""
+    tables = defaultdict(dict)
+    for row in stats:
+        tables[row['Placement']].setdefault(row['Size'], {})[row['Mode']] = row['Median']
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for placement, sizes in tables.items():
+        with open(directory / f'{placement}_node_data.csv', 'w') as file:
+            file.write('Size,Standard_Throughput,Buffered_Throughput\n')
+            for size, modes in sorted(sizes.items()):
+                file.write(f"{size},{modes.get('Standard')},{modes.get('Buffered')}\n")
+
+def parse_input(text, default_placement):
+    placement, sep, path = text.partition('=')
+    if sep and placement in PLACEMENTS:
+        return path, placement
+    return text, guess_placement(text, default_placement)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Convert MPI ping-pong logs to CSV.')
+    parser.add_argument('logs', nargs='*', default=['./in/raw_data.txt'],
+                        help='logs, optionally tagged as intra=PATH or inter=PATH '
+                             '(default: ./in/raw_data.txt)')
+    parser.add_argument('-p', '--placement', choices=PLACEMENTS, default='inter',
+                        help='placement of untagged logs whose name has neither intra nor inter '
+                             '(default: inter)')
+    parser.add_argument('-o', '--output', default='./out/data.csv',
+                        help='tidy table of all samples (default: ./out/data.csv)')
+    parser.add_argument('-s', '--stats', default='./out/stats.csv',
+                        help='per-size statistics (default: ./out/stats.csv)')
+    parser.add_argument('-d', '--delays', default='./out/delays.csv',
+                        help='1-byte delay of every run (default: ./out/delays.csv)')
+    parser.add_argument('--percentiles', default='5,25,75,95',
+                        help='comma-separated percentiles in the statistics (default: 5,25,75,95)')
+    parser.add_argument('--wide', metavar='DIR',
+                        help='also write median throughputs to DIR/<placement>_node_data.csv')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='logs parsed in parallel (default: 1)')
+    args = parser.parse_args()
+    args.logs = [parse_input(text, args.placement) for text in args.logs]
+    args.percentiles = [float(q) for q in args.percentiles.split(',')]
+    return args
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    paths, placements = zip(*args.logs)
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        parsed = list(pool.map(parse_log, paths, placements))
+    samples = [sample for log_samples, _ in parsed for sample in log_samples]
+    delays = [delay for _, log_delays in parsed for delay in log_delays]
+
+    # Write the processed data to CSV
+    with open(args.output, 'w', newline='') as file:
+        writer = csv.writer(file, lineterminator='\n')
+        writer.writerow(SAMPLE_FIELDS)
+        for run, placement, mode, size, throughput in samples:
+            # one-way time of a message, from its size in bits and the throughput
+            writer.writerow([run, placement, mode, size, throughput, size * 8 / throughput])
+
+    with open(args.delays, 'w', newline='') as file:
+        writer = csv.writer(file, lineterminator='\n')
+        writer.writerow(DELAY_FIELDS)
+        writer.writerows(delays)
+
+    stats = summarize(samples, args.percentiles)
+    with open(args.stats, 'w', newline='') as file:
+        fields = ['Placement', 'Mode', 'Size', 'Runs', 'Min'] + \
+            [f'P{q:g}' for q in args.percentiles] + ['Median', 'Mean', 'Max']
+        writer = csv.DictWriter(file, fieldnames=fields, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(stats)
+    if args.wide:
+        write_wide(stats, args.wide)
+
+    runs = len({sample[0] for sample in samples})
+    print(f"{len(samples)} samples from {runs} runs in {len(paths)} logs")
+    for placement in PLACEMENTS:
+        values = [delay for _, delay_placement, delay in delays if delay_placement == placement]
+        if values:
+            print(f"Delay for 1 byte ({placement}): median {np.median(values)} ms "
+                  f"over {len(values)} runs")
@@ -0,0 +1,132 @@
+"""Latency-bandwidth (Hockney) models of the measured MPI communication.
+
+The one-way time of an n-byte message is modelled as t(n) = alpha + beta * n,
+with the latency alpha in microseconds and beta in microseconds per byte
+(1 / bandwidth). MPI implementations switch protocol with the message size
+(eager to rendezvous), which changes both parameters, so the model is
+piecewise: the sizes are split at up to --max-breaks breakpoints, every
+segment gets its own alpha and beta, and the breakpoints and their number
+are chosen by the lowest BIC. Fits minimize relative errors, so the small
+messages weigh as much as the large ones.
+
+    from hockney import fit_csv
+    cost = fit_csv('../out/inter_node_data.csv', 'Standard')
+    cost(65536)  # predicted one-way time in microseconds
+
+n_half = alpha / beta is the message size reaching half of the asymptotic
+bandwidth of a segment.
+"""
+
+from bisect import bisect_right
+from itertools import combinations
+import argparse
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+MODES = ('Standard', 'Buffered')
+
+def load_times(csv_path, mode):
+    """Message sizes (bytes) and one-way times (us) of a *_node_data.csv mode."""
+    data = pd.read_csv(csv_path).sort_values('Size')
+    sizes = data['Size'].to_numpy(float)
+    # bits divided by Mbps gives microseconds
+    times = sizes * 8 / data[f'{mode}_Throughput'].to_numpy(float)
+    return sizes, times
+
+def fit_segment(sizes, times):
+    """alpha, beta minimizing the relative error; and the squared error sum."""
+    A = np.column_stack([1 / times, sizes / times])
+    (alpha, beta), _, _, _ = np.linalg.lstsq(A, np.ones_like(times), rcond=None)
+    residuals = A @ (alpha, beta) - 1
+    return alpha, beta, residuals @ residuals
+
+class CostModel:
+    """Piecewise alpha-beta model; calling it predicts one-way times in us."""
+
+    def __init__(self, breaks, segments):
+        self.breaks = list(breaks)      # first size of every segment but the first
+        self.segments = list(segments)  # (alpha, beta) of each segment
+
+    def __call__(self, size):
+        alpha, beta = self.segments[bisect_right(self.breaks, size)]
+        return alpha + beta * size
+
+    def throughput(self, size):
+        """Predicted throughput in Mbps."""
+        return size * 8 / self(size)
+
+    def n_half(self):
+        """Half-performance message length of each segment, in bytes."""
+        return [alpha / beta for alpha, beta in self.segments]
+
+    def to_dict(self):
+        return {'breaks': self.breaks,
+                'segments': [{'alpha_us': alpha, 'beta_us_per_byte': beta}
+                             for alpha, beta in self.segments]}
+
+    @classmethod
+    def from_dict(cls, fields):
+        return cls(fields['breaks'], [(segment['alpha_us'], segment['beta_us_per_byte'])
+                                      for segment in fields['segments']])
+
+def fit(sizes, times, max_breaks=2, min_points=3):
+    """Piecewise model with the number and places of breakpoints of lowest BIC."""
+    n = len(sizes)
+    best = None
+    for k in range(max_breaks + 1):
+        # cut positions i split the sorted sizes into [..i) and [i..)
+        for cuts in combinations(range(min_points, n - min_points + 1), k):
+            bounds = (0,) + cuts + (n,)
+            if any(b - a < min_points for a, b in zip(bounds, bounds[1:])):
+                continue
+            segments, error = [], 0.0
+            for a, b in zip(bounds, bounds[1:]):
+                alpha, beta, segment_error = fit_segment(sizes[a:b], times[a:b])
+                segments.append((alpha, beta))
+                error += segment_error
+            # two parameters per segment plus the breakpoints
+            parameters = 3 * (k + 1) - 1
+            bic = n * math.log(max(error, 1e-300) / n) + parameters * math.log(n)
+            if best is None or bic < best[0]:
+                best = (bic, [sizes[i] for i in cuts], segments)
+    return CostModel(best[1], best[2])
+
+def fit_csv(csv_path, mode, max_breaks=2):
+    return fit(*load_times(csv_path, mode), max_breaks=max_breaks)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fit piecewise Hockney models to MPI throughput.')
+    parser.add_argument('csv', nargs='*',
+                        default=['./out/intra_node_data.csv', './out/inter_node_data.csv'],
+                        help='*_node_data.csv files (default: both in ./out)')
+    parser.add_argument('--max-breaks', type=int, default=2,
+                        help='maximum number of protocol switches (default: 2)')
+    parser.add_argument('--predict', type=int, action='append', default=[], metavar='SIZE',
+                        help='print the predicted time of a SIZE-byte message')
+    parser.add_argument('-o', '--output', help='save the models as JSON')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    models = {}
+    for csv_path in args.csv:
+        for mode in MODES:
+            sizes, times = load_times(csv_path, mode)
+            model = fit(sizes, times, args.max_breaks)
+            models.setdefault(csv_path, {})[mode] = model.to_dict()
+            error = np.max(np.abs([model(s) / t - 1 for s, t in zip(sizes, times)]))
+            print(f"{csv_path} {mode}: max relative error {error:.1%}")
+            bounds = [sizes[0]] + model.breaks + [sizes[-1]]
+            for (alpha, beta), n_half, low, high in zip(model.segments, model.n_half(),
+                                                        bounds, bounds[1:]):
+                print(f"  {low:>8.0f} .. {high:<8.0f} bytes: alpha = {alpha:.3f} us, "
+                      f"bandwidth = {8 / beta:.1f} Mbps, n_half = {n_half:.0f} bytes")
+            for size in args.predict:
+                print(f"  {size} bytes: {model(size):.3f} us")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(models, file, indent=1)
@@ -0,0 +1,227 @@
+"""Ping-pong benchmark of local inter-process transports, in the format of homework.c.
+
+Two processes bounce messages of 1 byte to --max-size bytes (powers of two)
+over one transport, --reps round trips per size, and the output has the same
+lines as homework.c prints on the cluster, so convert.py and plot.py read it
+unchanged:
+
+    Delay for 1 byte: 0.012345 ms
+    Standard Communication: Size 1 bytes, Throughput: 0.654321 Mbps
+    Buffered Communication: Size 1 bytes, Throughput: 0.612345 Mbps
+
+Standard sends the message buffer itself. Buffered first copies it into a
+separate staging buffer and sends that, as MPI_Bsend does with its attached
+buffer. The transports are
+
+    pipe    a pair of os.pipe()s
+    socket  a Unix stream socket pair
+    queue   a pair of multiprocessing.Queues
+    shm     multiprocessing.shared_memory with a lock-free handoff: the sender
+            writes the message, then bumps a sequence number the receiver
+            spins on
+
+Only shm is measured unless --transports says otherwise. With several
+transports, each log goes to <output-dir>/intra_<transport>.txt, the name
+telling convert.py it was measured within a node:
+
+    python pingpong.py -t pipe,socket,queue,shm -o ./in/local
+"""
+
+from multiprocessing import shared_memory
+from pathlib import Path
+import argparse
+import multiprocessing
+import os
+import socket
+import struct
+import sys
+import time
+
+SEQUENCE = struct.Struct('<Q')
+# Spins on the sequence number before yielding the CPU to the other process
+SPINS = 1000
+
+class FdEndpoint:
+    def __init__(self, read_fd, write_fd):
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+
+    def send(self, view):
+        while view:
+            view = view[os.write(self.write_fd, view):]
+
+    def recv_into(self, view):
+        while view:
+            view = view[os.readv(self.read_fd, [view]):]
+
+class SocketEndpoint:
+    def __init__(self, sock):
+        self.sock = sock
+
+    def send(self, view):
+        self.sock.sendall(view)
+
+    def recv_into(self, view):
+        while view:
+            view = view[self.sock.recv_into(view):]
+
+class QueueEndpoint:
+    def __init__(self, inbox, outbox):
+        self.inbox = inbox
+        self.outbox = outbox
+
+    def send(self, view):
+        self.outbox.put(bytes(view))
+
+    def recv_into(self, view):
+        view[:] = self.inbox.get()
+
+class SharedMemoryEndpoint:
+    """One slot per direction: an 8-byte sequence number, then the message.
+
+    Ping-pong alternates strictly, so a slot is never written again before
+    its message was copied out, and no lock is needed.
+    """
+
+    def __init__(self, shm, slot_size, rank):
+        self.buf = shm.buf
+        self.shm = shm
+        self.out_slot = rank * slot_size
+        self.in_slot = (1 - rank) * slot_size
+        self.sent = 0
+        self.received = 0
+
+    def send(self, view):
+        start = self.out_slot + SEQUENCE.size
+        self.buf[start:start + len(view)] = view
+        self.sent += 1
+        SEQUENCE.pack_into(self.buf, self.out_slot, self.sent)
+
+    def recv_into(self, view):
+        self.received += 1
+        spins = 0
+        while SEQUENCE.unpack_from(self.buf, self.in_slot)[0] != self.received:
+            spins += 1
+            if spins == SPINS:
+                spins = 0
+                os.sched_yield()
+        start = self.in_slot + SEQUENCE.size
+        view[:] = self.buf[start:start + len(view)]
+
+def pipe_endpoints(max_size):
+    (r0, w1), (r1, w0) = os.pipe(), os.pipe()
+    return FdEndpoint(r0, w0), FdEndpoint(r1, w1)
+
+def socket_endpoints(max_size):
+    a, b = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    return SocketEndpoint(a), SocketEndpoint(b)
+
+def queue_endpoints(max_size):
+    to_0, to_1 = multiprocessing.Queue(), multiprocessing.Queue()
+    return QueueEndpoint(to_0, to_1), QueueEndpoint(to_1, to_0)
+
+def shm_endpoints(max_size):
+    slot_size = SEQUENCE.size + max_size
+    shm = shared_memory.SharedMemory(create=True, size=2 * slot_size)
+    shm.buf[:] = bytes(len(shm.buf))
+    return SharedMemoryEndpoint(shm, slot_size, 0), SharedMemoryEndpoint(shm, slot_size, 1)
+
+TRANSPORTS = {
+    'pipe': pipe_endpoints,
+    'socket': socket_endpoints,
+    'queue': queue_endpoints,
+    'shm': shm_endpoints,
+}
+
+def sizes_up_to(max_size):
+    size = 1
+    while size <= max_size:
+        yield size
+        size *= 2
+
+def ping_pong(endpoint, rank, size, reps, staging=None):
+    """Seconds of `reps` round trips of a size-byte message, from rank 0's view."""
+    buffer = memoryview(bytearray(size))
+    out = buffer
+    if staging is not None:
+        out = staging[:size]
+    start_time = time.perf_counter()
+    for _ in range(reps):
+        if rank == 0:
+            if staging is not None:
+                out[:] = buffer
+            endpoint.send(out)
+            endpoint.recv_into(buffer)
+        else:
+            endpoint.recv_into(buffer)
+            if staging is not None:
+                out[:] = buffer
+            endpoint.send(out)
+    return time.perf_counter() - start_time
+
+def run(endpoint, rank, max_size, reps, out=None):
+    """Both ranks run every test; rank 0 prints the results like homework.c."""
+    staging = memoryview(bytearray(max_size))
+    for size in sizes_up_to(max_size):
+        for mode, buffered in (('Standard', False), ('Buffered', True)):
+            # one untimed round trip lines both processes up, like MPI_Barrier
+            ping_pong(endpoint, rank, 1, 1)
+            elapsed = ping_pong(endpoint, rank, size, reps, staging if buffered else None)
+            elapsed /= 2.0 * reps
+            throughput = (size * 8.0 / elapsed) / 1e6
+            if rank == 0:
+                if size == 1 and not buffered:
+                    print(f"Delay for 1 byte: {elapsed * 1000:f} ms", file=out)
+                print(f"{mode} Communication: Size {size} bytes, Throughput: {throughput:f} Mbps",
+                      file=out)
+
+def benchmark(transport, max_size, reps, out):
+    context = multiprocessing.get_context('fork')
+    end0, end1 = TRANSPORTS[transport](max_size)
+    peer = context.Process(target=run, args=(end1, 1, max_size, reps))
+    peer.start()
+    try:
+        run(end0, 0, max_size, reps, out)
+    except BaseException:
+        # the peer would wait for our next message forever
+        peer.terminate()
+        raise
+    finally:
+        peer.join()
+        if transport == 'shm':
+            end0.shm.unlink()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Ping-pong benchmark of local IPC transports.')
+    parser.add_argument('-t', '--transports', default='shm',
+                        help=f"comma-separated transports out of {','.join(TRANSPORTS)} "
+                             '(default: shm)')
+    parser.add_argument('-r', '--reps', type=int, default=1000,
+                        help='round trips per message size (default: 1000)')
+    parser.add_argument('--max-size', type=int, default=1048576,
+                        help='largest message in bytes (default: 1048576)')
+    parser.add_argument('-o', '--output-dir',
+                        help='write one log per transport here (default: stdout, one transport)')
+    args = parser.parse_args()
+    args.transports = args.transports.split(',')
+    for transport in args.transports:
+        if transport not in TRANSPORTS:
+            parser.error(f"unknown transport '{transport}'")
+    if len(args.transports) > 1 and not args.output_dir:
+        parser.error('several transports need --output-dir')
+    if args.reps <= 0:
+        parser.error('Number of repetitions must be a positive integer')
+    return args
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    if args.output_dir:
+        Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    for transport in args.transports:
+        if args.output_dir:
+            with open(Path(args.output_dir) / f'intra_{transport}.txt', 'w') as out:
+                benchmark(transport, args.max_size, args.reps, out)
+            print(f"{transport}: done", file=sys.stderr)
+        else:
+            benchmark(transport, args.max_size, args.reps, sys.stdout)
@@ -0,0 +1,69 @@
+/* Generated by scripts/advise.py from the measured throughputs; do not edit. */
+#ifndef SEND_MODE_H
+#define SEND_MODE_H
+
+#include <mpi.h>
+#include <stddef.h>
+#include <stdint.h>
+
+typedef enum { SEND_MODE_STANDARD, SEND_MODE_BUFFERED } send_mode_t;
+typedef enum { PLACEMENT_INTRA, PLACEMENT_INTER } placement_t;
+
+/* Messages smaller than `limit` bytes (and not in an earlier range) use `mode` */
+typedef struct {
+    size_t limit;
+    send_mode_t mode;
+} send_mode_range_t;
+
+static const send_mode_range_t send_mode_intra[] = {
+    {SIZE_MAX, SEND_MODE_STANDARD},
+};
+
+static const send_mode_range_t send_mode_inter[] = {
+    {2u, SEND_MODE_STANDARD},
+    {6u, SEND_MODE_BUFFERED},
+    {92682u, SEND_MODE_STANDARD},
+    {185364u, SEND_MODE_BUFFERED},
+    {SIZE_MAX, SEND_MODE_STANDARD},
+};
+
+static inline send_mode_t send_mode_choose(size_t bytes, placement_t placement) {
+    const send_mode_range_t *table = NULL;
+    switch (placement) {
+    case PLACEMENT_INTRA: table = send_mode_intra; break;
+    case PLACEMENT_INTER: table = send_mode_inter; break;
+    default: return SEND_MODE_STANDARD;
+    }
+    while (table->limit != SIZE_MAX && bytes >= table->limit) {
+        table++;
+    }
+    return table->mode;
+}
+
+/* Whether `peer` of `comm` runs on the same node as the caller; collective over comm */
+static inline placement_t send_mode_placement(MPI_Comm comm, int peer) {
+    MPI_Comm node;
+    MPI_Group group, node_group;
+    int node_peer;
+    MPI_Comm_split_type(comm, MPI_COMM_TYPE_SHARED, 0, MPI_INFO_NULL, &node);
+    MPI_Comm_group(comm, &group);
+    MPI_Comm_group(node, &node_group);
+    MPI_Group_translate_ranks(group, 1, &peer, node_group, &node_peer);
+    MPI_Group_free(&node_group);
+    MPI_Group_free(&group);
+    MPI_Comm_free(&node);
+    return node_peer == MPI_UNDEFINED ? PLACEMENT_INTER : PLACEMENT_INTRA;
+}
+
+/* MPI_Send or MPI_Bsend, whichever was faster for this size and placement */
+static inline int send_mode_send(const void *buf, int count, MPI_Datatype type, int dest,
+                                 int tag, MPI_Comm comm, placement_t placement) {
+    int type_size;
+    MPI_Type_size(type, &type_size);
+    if (send_mode_choose((size_t)count * type_size, placement) == SEND_MODE_BUFFERED) {
+        return MPI_Bsend(buf, count, type, dest, tag, comm);
+    }
+    return MPI_Send(buf, count, type, dest, tag, comm);
+}
+
+#endif /* SEND_MODE_H */
@@ -0,0 +1,276 @@
+"""Monte Carlo estimation of pi in Python, the local counterpart of pi_parallel.c.
+
+Points are drawn with NumPy in batches of --batch points, so memory stays
+bounded for any problem size. With several workers the points are split
+evenly over a ProcessPoolExecutor, each worker drawing from its own stream
+spawned from one SeedSequence, so the streams are independent and a seed
+reproduces the whole run.
+
+`scaling` repeats run_parallel.sh locally: for 1..--max-procs workers it
+averages --repeats timed runs of every problem size, the same total number
+of points for strong scaling and points * workers for weak scaling, and
+writes results_<scaling>_scaling_<SIZE>.csv with the `Processors,Time (s)`
+columns plot_scaling_results.py reads. As in pi_parallel.c, only the
+sampling is timed, not the start of the worker processes.
+
+Besides plain Monte Carlo (--method mc) there are variance-reduced
+estimators, all reporting the standard error they achieve:
+
+    antithetic  every point (x, y) is paired with (1 - x, 1 - y); the quarter
+                circle test is monotone, so the two are negatively correlated
+    stratified  the unit square is cut into --strata x --strata cells with one
+                point in each; a replicate is one point per cell, and the error
+                comes from the spread of the replicates
+    sobol       randomized quasi-Monte Carlo: --replicates independently
+    halton      scrambled low-discrepancy sequences, the error coming from the
+                spread of their means (sobol rounds each replicate's points
+                down to a power of two, which keeps its balance)
+
+`target` measures the wall time each method needs to reach a standard error,
+doubling the points until it does, and reports accuracy per CPU-second as
+1 / (error^2 * CPU seconds), which does not depend on the number of points.
+
+    python pi_engine.py estimate 10000000 -w 4 --method stratified
+    python pi_engine.py scaling --sizes SMALL=100000,MEDIUM=10000000 -o local
+    python pi_engine.py target 1e-5 --methods mc,antithetic,stratified,sobol
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+import argparse
+import math
+import time
+
+import numpy as np
+from scipy.stats import qmc
+
+BATCH = 1 << 20
+METHODS = ('mc', 'antithetic', 'stratified', 'sobol', 'halton')
+
+def inside(xy):
+    """1.0 where the (x, y) rows lie in the quarter circle, else 0.0."""
+    xy = xy * xy
+    return (xy[..., 0] + xy[..., 1] <= 1.0).astype(float)
+
+# Samplers return (units, sum, sum of squares, points) of the per-unit
+# estimates of pi / 4, where a unit is a point, a pair or a replicate
+
+def sample_mc(points, seed, batch=BATCH):
+    rng = np.random.default_rng(seed)
+    hits = 0
+    for start in range(0, points, batch):
+        n = min(batch, points - start)
+        # consecutive (x, y) pairs of the stream, so the batch size does not
+        # change the result
+        hits += int(inside(rng.random((n, 2))).sum())
+    return points, hits, hits, points
+
+def sample_antithetic(pairs, seed, batch=BATCH):
+    rng = np.random.default_rng(seed)
+    total = squares = 0.0
+    for start in range(0, pairs, batch):
+        xy = rng.random((min(batch, pairs - start), 2))
+        values = (inside(xy) + inside(1 - xy)) / 2
+        total += values.sum()
+        squares += values @ values
+    return pairs, total, squares, 2 * pairs
+
+def sample_stratified(replicates, seed, strata, batch=BATCH):
+    rng = np.random.default_rng(seed)
+    cells = np.stack(np.meshgrid(np.arange(strata), np.arange(strata)), -1).reshape(-1, 2)
+    chunk = max(1, batch // len(cells))
+    total = squares = 0.0
+    for start in range(0, replicates, chunk):
+        n = min(chunk, replicates - start)
+        xy = (cells + rng.random((n, len(cells), 2))) / strata
+        values = inside(xy).mean(axis=1)
+        total += values.sum()
+        squares += values @ values
+    return replicates, total, squares, replicates * len(cells)
+
+def sample_qmc(length, seeds, engine, batch=BATCH):
+    values = []
+    for seed in seeds:
+        sampler = engine(d=2, scramble=True, seed=np.random.default_rng(seed))
+        hits = 0.0
+        for start in range(0, length, batch):
+            hits += inside(sampler.random(min(batch, length - start))).sum()
+        values.append(hits / length)
+    values = np.array(values)
+    return len(values), values.sum(), values @ values, length * len(values)
+
+def split_points(points, workers):
+    """Points of each worker, differing by at most one."""
+    share, extra = divmod(points, workers)
+    return [share + (i < extra) for i in range(workers)]
+
+def make_tasks(method, points, workers, seed, batch, strata=32, replicates=16):
+    """One sampler call per worker covering about `points` points."""
+    seed_seq = np.random.SeedSequence(seed)
+    if method in ('sobol', 'halton'):
+        length = max(1, points // replicates)
+        if method == 'sobol':
+            length = 1 << (length.bit_length() - 1)
+        engine = qmc.Sobol if method == 'sobol' else qmc.Halton
+        # one stream per replicate, so the estimate does not depend on workers
+        seeds = seed_seq.spawn(replicates)
+        return [partial(sample_qmc, length, list(chunk), engine, batch)
+                for chunk in np.array_split(np.array(seeds, dtype=object), workers) if len(chunk)]
+    streams = seed_seq.spawn(workers)
+    if method == 'stratified':
+        units = max(2, points // strata ** 2)
+        return [partial(sample_stratified, share, stream, strata, batch)
+                for share, stream in zip(split_points(units, workers), streams)]
+    if method == 'antithetic':
+        return [partial(sample_antithetic, share, stream, batch)
+                for share, stream in zip(split_points(max(1, points // 2), workers), streams)]
+    return [partial(sample_mc, share, stream, batch)
+            for share, stream in zip(split_points(points, workers), streams)]
+
+def _call(task):
+    return task()
+
+def estimate(points, workers=1, seed=None, batch=BATCH, pool=None, method='mc',
+             strata=32, replicates=16):
+    """(pi estimate, standard error, points used) from about `points` samples."""
+    tasks = make_tasks(method, points, workers, seed, batch, strata, replicates)
+    results = list(map(_call, tasks) if pool is None else pool.map(_call, tasks))
+    units, total, squares, used = (sum(column) for column in zip(*results))
+    mean = total / units
+    variance = max(squares - units * mean * mean, 0.0) / max(units - 1, 1)
+    return 4 * mean, 4 * math.sqrt(variance / units), used
+
+def start_workers(pool, workers):
+    # the pool starts processes on demand; blocking tasks make it start them all
+    list(pool.map(time.sleep, [0.05] * workers))
+
+def timed_estimate(points, workers, seed=None, batch=BATCH, method='mc'):
+    """Seconds of one estimate with `workers` processes, excluding their start."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        start_workers(pool, workers)
+        start_time = time.perf_counter()
+        estimate(points, workers, seed, batch, pool, method)
+        return time.perf_counter() - start_time
+
+def time_to_target(method, target, workers, seed=None, start_points=1 << 16,
+                   max_points=1 << 34, batch=BATCH):
+    """Double the points until the standard error is at most `target`.
+
+    Returns (seconds of the successful run, points, pi estimate, error), or
+    None if max_points was not enough.
+    """
+    points = start_points
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        start_workers(pool, workers)
+        while points <= max_points:
+            start_time = time.perf_counter()
+            pi, error, used = estimate(points, workers, seed, batch, pool, method)
+            elapsed = time.perf_counter() - start_time
+            if error <= target:
+                return elapsed, used, pi, error
+            # the error shrinks as 1 / sqrt(points) or faster, so jump close
+            points = max(2 * points, int(points * (error / target) ** 2))
+    return None
+
+def scaling(scaling_type, label, points, max_procs, repeats, output_dir, batch=BATCH,
+            method='mc'):
+    output_file = Path(output_dir) / f'results_{scaling_type}_scaling_{label}.csv'
+    with open(output_file, 'w') as f:
+        f.write('Processors,Time (s)\n')
+        for procs in range(1, max_procs + 1):
+            effective_points = points if scaling_type == 'strong' else points * procs
+            total_time = 0.0
+            for run in range(1, repeats + 1):
+                time_taken = timed_estimate(effective_points, procs, batch=batch, method=method)
+                total_time += time_taken
+                print(f"Run {run}: {procs} processors, Time: {time_taken:f} s")
+            f.write(f'{procs},{total_time / repeats:.4f}\n')
+            f.flush()
+
+def parse_sizes(text):
+    sizes = []
+    for item in text.split(','):
+        label, _, points = item.partition('=')
+        sizes.append((label, int(float(points))))
+    return sizes
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Monte Carlo estimation of pi.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    single = commands.add_parser('estimate', help='estimate pi once')
+    single.add_argument('points', type=int, help='number of points')
+    single.add_argument('-w', '--workers', type=int, default=1,
+                        help='worker processes (default: 1)')
+    single.add_argument('--seed', type=int, help='random seed (default: fresh entropy)')
+    single.add_argument('--batch', type=int, default=BATCH,
+                        help=f'points drawn at once per worker (default: {BATCH})')
+    single.add_argument('-m', '--method', choices=METHODS, default='mc',
+                        help='estimator (default: mc)')
+    single.add_argument('--strata', type=int, default=32,
+                        help='cells per axis of the stratified method (default: 32)')
+    single.add_argument('--replicates', type=int, default=16,
+                        help='randomized sequences of the sobol and halton methods (default: 16)')
+
+    harness = commands.add_parser('scaling', help='strong and weak scaling experiments')
+    harness.add_argument('--scaling', default='strong,weak',
+                         help='comma-separated scaling types (default: strong,weak)')
+    harness.add_argument('--sizes', type=parse_sizes,
+                         default='SMALL=100000,MEDIUM=10000000,LARGE=10000000000',
+                         help='comma-separated LABEL=POINTS problem sizes '
+                              '(default: those of run_parallel.sh)')
+    harness.add_argument('--max-procs', type=int, default=12,
+                         help='largest number of workers (default: 12)')
+    harness.add_argument('--repeats', type=int, default=10,
+                         help='runs averaged per configuration (default: 10)')
+    harness.add_argument('--batch', type=int, default=BATCH,
+                         help=f'points drawn at once per worker (default: {BATCH})')
+    harness.add_argument('-m', '--method', choices=METHODS, default='mc',
+                         help='estimator (default: mc)')
+    harness.add_argument('-o', '--output-dir', default='local',
+                         help='directory for the results files, kept apart from the cluster '
+                              'results (default: local)')
+
+    target = commands.add_parser('target', help='time each method to reach a standard error')
+    target.add_argument('error', type=float, help='target standard error of pi')
+    target.add_argument('--methods', default=','.join(METHODS),
+                        help=f"comma-separated methods (default: {','.join(METHODS)})")
+    target.add_argument('-w', '--workers', type=int, default=1,
+                        help='worker processes (default: 1)')
+    target.add_argument('--seed', type=int, help='random seed (default: fresh entropy)')
+    target.add_argument('--max-points', type=float, default=2 ** 34,
+                        help='give up beyond this many points (default: 2^34)')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    if args.command == 'estimate':
+        start_time = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            pi, error, used = estimate(args.points, args.workers, args.seed, args.batch,
+                                       pool if args.workers > 1 else None, args.method,
+                                       args.strata, args.replicates)
+        elapsed = time.perf_counter() - start_time
+        print(f"Estimated Pi = {pi:f} +- {error:.2e} ({used} points)")
+        print(f"Time taken = {elapsed:f} seconds")
+    elif args.command == 'target':
+        print(f"{'method':<11} {'seconds':>9} {'points':>12} {'error':>9} {'|pi - est|':>10} "
+              f"{'accuracy/CPU-s':>14}")
+        for method in args.methods.split(','):
+            result = time_to_target(method, args.error, args.workers, args.seed,
+                                    max_points=int(args.max_points))
+            if result is None:
+                print(f"{method:<11} target not reached within {int(args.max_points)} points")
+                continue
+            elapsed, used, pi, error = result
+            accuracy = 1 / (error ** 2 * elapsed * args.workers)
+            print(f"{method:<11} {elapsed:9.4f} {used:12d} {error:9.2e} {abs(pi - math.pi):10.2e} "
+                  f"{accuracy:14.3e}")
+    else:
+        Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+        for scaling_type in args.scaling.split(','):
+            for label, points in args.sizes:
+                scaling(scaling_type, label, points, args.max_procs, args.repeats,
+                        args.output_dir, args.batch, args.method)
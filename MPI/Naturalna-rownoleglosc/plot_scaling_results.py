@@ -1,21 +1,22 @@
 import matplotlib.pyplot as plt
-import pandas as pd
 import numpy as np
 import os
 
+from scaling_laws import ScalingData
+
 # Tworzenie katalogu na wykresy, jeśli nie istnieje
 output_dir = "out"
 os.makedirs(output_dir, exist_ok=True)
 
 # Wczytywanie danych dla skalowania silnego
-strong_small = pd.read_csv("results_strong_scaling_SMALL.csv")
-strong_medium = pd.read_csv("results_strong_scaling_MEDIUM.csv")
-strong_large = pd.read_csv("results_strong_scaling_LARGE.csv")
+strong_small = ScalingData("results_strong_scaling_SMALL.csv")
+strong_medium = ScalingData("results_strong_scaling_MEDIUM.csv")
+strong_large = ScalingData("results_strong_scaling_LARGE.csv")
 
 # Wczytywanie danych dla skalowania słabego
-weak_small = pd.read_csv("results_weak_scaling_SMALL.csv")
-weak_medium = pd.read_csv("results_weak_scaling_MEDIUM.csv")
-weak_large = pd.read_csv("results_weak_scaling_LARGE.csv")
+weak_small = ScalingData("results_weak_scaling_SMALL.csv")
+weak_medium = ScalingData("results_weak_scaling_MEDIUM.csv")
+weak_large = ScalingData("results_weak_scaling_LARGE.csv")
 
 # Przypisanie etykiet i kolorów do wykresów
 dataset_labels = ["Mały problem", "Średni problem", "Duży problem"]
@@ -27,8 +28,8 @@ def plot_scaling_metric(title, ylabel, filename, datasets, metric_func=None):
 
     # Iteracja po rozmiarach problemu i przetwarzanie danych
     for data, label, color in zip(datasets, dataset_labels, colors):
-        metric_values = metric_func(data) if metric_func else data["Time (s)"]
-        plt.plot(data["Processors"], metric_values, 'o-', label=label, color=color)
+        metric_values = metric_func(data) if metric_func else data.times
+        plt.plot(data.processors, metric_values, 'o-', label=label, color=color)
 
     plt.xlabel("Liczba procesorów")
     plt.ylabel(ylabel)
@@ -43,13 +44,12 @@ def plot_speedup(title, filename, datasets):
     plt.figure(figsize=(10, 6))
 
     # Pobieranie liczby procesorów dla wyznaczenia linii idealnego skalowania
-    processors = np.array(strong_small["Processors"])
+    processors = np.array(strong_small.processors)
     plt.plot(processors, processors, 'k--', label="Idealne skalowanie", alpha=0.7)
 
     # Iteracja po rozmiarach problemu i obliczanie przyspieszenia
     for data, label, color in zip(datasets, dataset_labels, colors):
-        speedup = data["Time (s)"].iloc[0] / data["Time (s)"]
-        plt.plot(data["Processors"], speedup, 'o-', label=label, color=color)
+        plt.plot(data.processors, data.speedup(), 'o-', label=label, color=color)
 
     plt.xlabel("Liczba procesorów")
     plt.ylabel("Przyspieszenie")
@@ -68,9 +68,7 @@ def plot_efficiency(title, filename, datasets):
 
     # Iteracja po rozmiarach problemu i obliczanie efektywności
     for data, label, color in zip(datasets, dataset_labels, colors):
-        speedup = data["Time (s)"].iloc[0] / data["Time (s)"]
-        efficiency = speedup / data["Processors"]
-        plt.plot(data["Processors"], efficiency, 'o-', label=label, color=color)
+        plt.plot(data.processors, data.efficiency(), 'o-', label=label, color=color)
 
     plt.xlabel("Liczba procesorów")
     plt.ylabel("Efektywność (Speedup / P)")
@@ -84,11 +82,11 @@ def plot_efficiency(title, filename, datasets):
 def plot_serial_fraction(title, filename, datasets):
     plt.figure(figsize=(10, 6))
 
-    # Iteracja po rozmiarach problemu i obliczanie części sekwencyjnej
+    # Iteracja po rozmiarach problemu: metryka Karpa-Flatta z niepewnością
     for data, label, color in zip(datasets, dataset_labels, colors):
-        speedup = data["Time (s)"].iloc[0] / data["Time (s)"]
-        serial_fraction = (1 / speedup - 1 / data["Processors"]) / (1 - 1 / data["Processors"])
-        plt.plot(data["Processors"], serial_fraction, 'o-', label=label, color=color)
+        serial_fraction, errors = data.karp_flatt()
+        plt.errorbar(data.processors, serial_fraction, yerr=errors, fmt='o-', capsize=3,
+                     label=label, color=color)
 
     plt.xlabel("Liczba procesorów")
     plt.ylabel("Część sekwencyjna")
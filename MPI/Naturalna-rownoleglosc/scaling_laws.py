@@ -0,0 +1,174 @@
+"""Scaling-law fits of the results_*_scaling_*.csv files.
+
+Strong scaling (fixed problem) is fitted to Amdahl's law through the run
+times, T(p) = T1 * (f + (1 - f) / p), by linear least squares in a = T1 * f
+and b = T1 * (1 - f). All points count, not just the single-processor run.
+Weak scaling (problem growing with p) can instead be fitted to Gustafson's
+law for the scaled speedup p * T1 / Tp, S(p) = p - f * (p - 1), with
+--scaled. Everything else uses the plain speedup T1 / Tp, as the plots do.
+
+The Karp-Flatt metric e(p) = (1 / S - 1 / p) / (1 - 1 / p) is the serial
+fraction implied by each measurement. Its uncertainty is propagated from the
+time resolution of the CSV files (run_parallel.sh rounds averages to four
+decimals, which dominates for the small problem). A growing e(p) means
+overhead that grows with p, which neither law models. Points whose measured
+speedup differs from the fitted law by more than --tolerance, and by more
+than their uncertainty, are flagged as diverging.
+
+    python scaling_laws.py --extrapolate 16,32,64
+    python scaling_laws.py --scaled results_weak_scaling_*.csv
+"""
+
+from pathlib import Path
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+
+class ScalingData:
+    """Processor counts and run times of one results CSV, with time uncertainty."""
+
+    def __init__(self, path, weak=None):
+        raw = pd.read_csv(path, dtype=str)
+        self.path = Path(path)
+        self.weak = 'weak' in self.path.name if weak is None else weak
+        self.processors = raw['Processors'].astype(int).to_numpy()
+        self.times = raw['Time (s)'].astype(float).to_numpy()
+        # standard deviation of rounding to the last printed decimal
+        decimals = raw['Time (s)'].str.partition('.')[2].str.len().to_numpy()
+        self.time_errors = 10.0 ** -decimals / math.sqrt(12)
+
+    def speedup(self, scaled=False):
+        """T1 / Tp, or the scaled speedup p * T1 / Tp of Gustafson's law."""
+        speedup = self.times[0] / self.times
+        return speedup * self.processors if scaled else speedup
+
+    def speedup_errors(self, scaled=False):
+        relative = np.hypot(self.time_errors / self.times, self.time_errors[0] / self.times[0])
+        return self.speedup(scaled) * relative
+
+    def efficiency(self, scaled=False):
+        return self.speedup(scaled) / self.processors
+
+    def karp_flatt(self, scaled=False):
+        """Karp-Flatt metric and its standard error for p > 1 (NaN at p = 1)."""
+        p = self.processors.astype(float)
+        speedup, errors = self.speedup(scaled), self.speedup_errors(scaled)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metric = (1 / speedup - 1 / p) / (1 - 1 / p)
+            metric_errors = errors / speedup ** 2 / (1 - 1 / p)
+        metric[p == 1] = np.nan
+        metric_errors[p == 1] = np.nan
+        return metric, metric_errors
+
+class LawFit:
+    """Fitted serial fraction f of Amdahl's or Gustafson's law."""
+
+    def __init__(self, law, serial_fraction, serial_fraction_error):
+        self.law = law
+        self.serial_fraction = serial_fraction
+        self.serial_fraction_error = serial_fraction_error
+        # Gustafson's law predicts the scaled speedup
+        self.scaled = law == 'gustafson'
+
+    def speedup(self, processors, serial_fraction=None):
+        f = self.serial_fraction if serial_fraction is None else serial_fraction
+        p = np.asarray(processors, dtype=float)
+        if self.law == 'amdahl':
+            return 1 / (f + (1 - f) / p)
+        return p - f * (p - 1)
+
+    def speedup_interval(self, processors):
+        """Speedups at f +- one standard error."""
+        low = self.serial_fraction - self.serial_fraction_error
+        high = self.serial_fraction + self.serial_fraction_error
+        ends = self.speedup(processors, low), self.speedup(processors, high)
+        return np.minimum(*ends), np.maximum(*ends)
+
+    def efficiency(self, processors):
+        return self.speedup(processors) / np.asarray(processors, dtype=float)
+
+def fit_amdahl(data):
+    """Least squares of T(p) = a + b / p; f = a / (a + b)."""
+    p = data.processors.astype(float)
+    X = np.column_stack([np.ones_like(p), 1 / p])
+    coef, _, _, _ = np.linalg.lstsq(X, data.times, rcond=None)
+    residuals = data.times - X @ coef
+    dof = max(len(p) - 2, 1)
+    cov = residuals @ residuals / dof * np.linalg.inv(X.T @ X)
+    a, b = coef
+    # delta method: gradient of a / (a + b)
+    gradient = np.array([b, -a]) / (a + b) ** 2
+    return LawFit('amdahl', a / (a + b), math.sqrt(gradient @ cov @ gradient))
+
+def fit_gustafson(data):
+    """Least squares of p - S(p) = f * (p - 1)."""
+    x = data.processors - 1.0
+    y = data.processors - data.speedup(scaled=True)
+    f = x @ y / (x @ x)
+    residuals = y - f * x
+    dof = max(len(x) - 1, 1)
+    return LawFit('gustafson', f, math.sqrt(residuals @ residuals / dof / (x @ x)))
+
+def fit(data, scaled=False):
+    """Gustafson's law for weak scaling if scaled, else Amdahl's law."""
+    return fit_gustafson(data) if scaled and data.weak else fit_amdahl(data)
+
+def divergences(data, law, tolerance=0.1, sigmas=2.0):
+    """Processor counts whose speedup is off the fitted law beyond tolerance and noise."""
+    fitted = law.speedup(data.processors)
+    deviation = data.speedup(law.scaled) - fitted
+    relative = np.abs(deviation) / fitted
+    significant = np.abs(deviation) > sigmas * data.speedup_errors(law.scaled)
+    return [(int(p), float(r)) for p, r, s in zip(data.processors, relative, significant)
+            if r > tolerance and s]
+
+def karp_flatt_trend(data):
+    """Slope of the Karp-Flatt metric over p and its standard error (weighted fit)."""
+    metric, errors = data.karp_flatt()
+    keep = np.isfinite(metric) & (errors > 0)
+    p, metric, weights = data.processors[keep], metric[keep], 1 / errors[keep]
+    X = np.column_stack([np.ones_like(p), p]) * weights[:, None]
+    coef, _, _, _ = np.linalg.lstsq(X, metric * weights, rcond=None)
+    cov = np.linalg.inv(X.T @ X)
+    return coef[1], math.sqrt(cov[1, 1])
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fit scaling laws to the scaling results.')
+    parser.add_argument('csv', nargs='*', help='results files (default: results_*_scaling_*.csv)')
+    parser.add_argument('--extrapolate', default='16,24,32,64',
+                        help='comma-separated processor counts to predict (default: 16,24,32,64)')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='relative speedup deviation flagged as diverging (default: 0.1)')
+    parser.add_argument('--scaled', action='store_true',
+                        help="fit weak scaling to Gustafson's law on the scaled speedup p * T1 / Tp")
+    args = parser.parse_args()
+    args.csv = args.csv or sorted(str(path) for path in Path('.').glob('results_*_scaling_*.csv'))
+    args.extrapolate = [int(p) for p in args.extrapolate.split(',')]
+    return args
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    for path in args.csv:
+        data = ScalingData(path)
+        law = fit(data, args.scaled)
+        slope, slope_error = karp_flatt_trend(data)
+        print(f"{path}: {law.law}, serial fraction {law.serial_fraction:.5f} "
+              f"+- {law.serial_fraction_error:.5f}")
+        print(f"  Karp-Flatt slope {slope:+.2e} +- {slope_error:.1e} per processor")
+        if not 0 <= law.serial_fraction < 1:
+            print(f"  serial fraction outside [0, 1): the times do not follow {law.law.capitalize()}'s law")
+        metric, errors = data.karp_flatt()
+        for p, speedup, e, e_error in zip(data.processors, data.speedup(law.scaled),
+                                          metric, errors):
+            if p > 1:
+                print(f"  p={p:<3} speedup {speedup:6.2f}  Karp-Flatt {e:+.4f} +- {e_error:.4f}")
+        for p, deviation in divergences(data, law, args.tolerance):
+            print(f"  diverges at p={p}: {deviation:.0%} off the fitted law")
+        low, high = law.speedup_interval(args.extrapolate)
+        for p, speedup, efficiency, lo, hi in zip(args.extrapolate, law.speedup(args.extrapolate),
+                                                  law.efficiency(args.extrapolate), low, high):
+            print(f"  predicted p={p:<3} speedup {speedup:6.2f} [{lo:.2f}, {hi:.2f}], "
+                  f"efficiency {efficiency:.3f}")